@@ -0,0 +1,226 @@
+import datetime
+import hashlib
+import json
+
+from flask import (
+    Blueprint, Response, abort, current_app, jsonify, request,
+    stream_with_context
+)
+
+from model import Venue, Artist, Show
+from pagination import keyset_paginate, InvalidCursor
+from schedule import InvalidWindow, parse_window, group_by_day, local_time
+
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _selected_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(',') if f.strip()]
+
+
+def _select(item, fields):
+    if fields is None:
+        return item
+    return {k: item[k] for k in fields if k in item}
+
+
+def _per_page():
+    try:
+        per_page = int(request.args.get(
+            'per_page', current_app.config['ITEMS_PER_PAGE']
+        ))
+    except ValueError:
+        abort(400)
+    if per_page < 1:
+        abort(400)
+    return min(per_page, current_app.config['API_MAX_PAGE_SIZE'])
+
+
+def _stream_page(page, serialize, fields):
+    """JSON body of a page, produced one item at a time."""
+    yield '{"data": ['
+    for i, item in enumerate(page.items):
+        if i:
+            yield ', '
+        yield json.dumps(_select(serialize(item), fields))
+    yield '], "next": {}, "prev": {}}}'.format(
+        json.dumps(page.next_cursor), json.dumps(page.prev_cursor)
+    )
+
+
+def _collection(query, columns, key, serialize, records):
+    """Paginated, streamed and conditional JSON listing.
+
+    `records` maps a row to every record its serialization depends on;
+    their ids and `updated_at` make up the ETag and Last-Modified, so a 304
+    can be answered without serializing anything.
+    """
+    try:
+        page = keyset_paginate(
+            query, columns, key,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=_per_page()
+        )
+    except InvalidCursor:
+        abort(400)
+
+    digest = hashlib.sha1(request.query_string)
+    last_modified = None
+    for row in page.items:
+        for record in records(row):
+            digest.update(
+                f'{record!r}@{record.updated_at};'.encode()
+            )
+            if last_modified is None or record.updated_at > last_modified:
+                last_modified = record.updated_at
+
+    response = Response(
+        stream_with_context(
+            _stream_page(page, serialize, _selected_fields())
+        ),
+        mimetype='application/json'
+    )
+    response.set_etag(digest.hexdigest())
+    response.last_modified = last_modified
+    return response.make_conditional(request)
+
+
+def _document(data):
+    """JSON document with an ETag of its content."""
+    if data is None:
+        abort(404)
+
+    response = jsonify(_select(data, _selected_fields()))
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@api.route('/venues')
+def venues():
+    return _collection(
+        Venue.query, [Venue.name, Venue.id],
+        key=lambda venue: (venue.name, venue.id),
+        serialize=lambda venue: venue.serialize,
+        records=lambda venue: [venue]
+    )
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return _document(Venue.load_details(venue_id))
+
+
+@api.route('/artists')
+def artists():
+    return _collection(
+        Artist.query, [Artist.name, Artist.id],
+        key=lambda artist: (artist.name, artist.id),
+        serialize=lambda artist: artist.serialize,
+        records=lambda artist: [artist]
+    )
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return _document(Artist.load_details(artist_id))
+
+
+@api.route('/shows')
+def shows():
+    return _collection(
+        Show.query_with_artist_venue(), [Show.start_time, Show.id],
+        key=lambda show: (show.start_time, show.id),
+        serialize=lambda show: show.serialize_with_artist_venue,
+        records=lambda show: [show, show.venue, show.artist]
+    )
+
+
+@api.route('/shows/calendar')
+def shows_calendar():
+    """Shows between `from` and `to`, grouped by day, optionally narrowed
+    to a venue `city` and `state` and to an artist `genre`."""
+    try:
+        window = parse_window(
+            request.args, current_app.config['CALENDAR_MAX_DAYS']
+        )
+    except InvalidWindow:
+        abort(400)
+
+    fields = _selected_fields()
+    response = jsonify({
+        'from': window['start'].isoformat(),
+        'to': window['end'].isoformat(),
+        'days': [
+            {
+                'date': day.isoformat(),
+                'shows': [
+                    _select(show.serialize_with_artist_venue, fields)
+                    for show in day_shows
+                ],
+            }
+            for day, day_shows in group_by_day(Show.in_window(**window))
+        ],
+    })
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@api.route('/shows/conflicts', methods=['POST'])
+def show_conflicts():
+    """Check proposed bookings, a JSON {"bookings": [{venue_id, artist_id,
+    start_time[, end_time]}]}, against the shows and each other.
+
+    Answers the bookings that overlap something, by index, with the shows
+    and the other bookings they overlap.
+    """
+    items = (request.get_json(silent=True) or {}).get('bookings')
+    if not isinstance(items, list) \
+            or len(items) > current_app.config['API_MAX_BOOKINGS']:
+        abort(400)
+
+    bookings = []
+    try:
+        for item in items:
+            booking = Show(
+                venue_id=int(item['venue_id']),
+                artist_id=int(item['artist_id']),
+                start_time=local_time(
+                    datetime.datetime.fromisoformat(item['start_time'])
+                ),
+                end_time=local_time(
+                    datetime.datetime.fromisoformat(item['end_time'])
+                ) if item.get('end_time') else None
+            )
+            booking.validate_times()
+            bookings.append(booking)
+    except (KeyError, TypeError, ValueError):
+        abort(400)
+
+    conflicts = Show.conflicts(bookings)
+    return jsonify({'conflicts': [
+        {
+            'index': i,
+            'shows': [show.serialize for show in conflicts[i]['shows']],
+            'bookings': conflicts[i]['bookings'],
+        }
+        for i in sorted(conflicts)
+    ]})
+
+
+@api.route('/shows/<int:show_id>')
+def show(show_id):
+    show = Show.query_with_artist_venue().filter(
+        Show.id == show_id
+    ).one_or_none()
+    return _document(show.serialize_with_artist_venue if show else None)
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({'error': error.name}), error.code
@@ -2,14 +2,17 @@
 # Imports
 #----------------------------------------------------------------------------#
 from threading import local
-from model import db, Artist, Venue, Show
+from model import db, Artist, Venue, Show, purge_archived
 from sqlalchemy.orm.exc import NoResultFound
 import traceback
 
 import json
+import functools
+from datetime import datetime, timedelta
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+import babel.dates
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
@@ -17,6 +20,28 @@ from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
+from pagination import keyset_paginate, InvalidCursor
+from schedule import InvalidWindow, is_calendar_query, parse_window, group_by_day
+from cache import response_cache, fragment_cache
+from search import search
+from enums import Genre
+from explain import check_plans
+from api import api
+from importer import import_rows, read_rows
+from exporter import export_shows
+from benchmark import (
+    seed_data, run_benchmark, compare, benchmark_datetime_filter, load_test,
+    benchmark_writes, benchmark_search, benchmark_show_serialization
+)
+from database import pool_metrics, wrote_recently
+from profiling import profiler
+from templating import configure_templates, compile_templates, benchmark_templates
+from assets import assets, build_assets
+from async_reads import async_reads
+import gzip
+import sys
+import time
+import click
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -25,20 +50,68 @@ app.config.from_object('config')
 moment = Moment(app)
 db.init_app(app)
 migrate = Migrate(app, db)
+response_cache.init_app(app)
+fragment_cache.init_app(app)
+assets.init_app(app)
+async_reads.init_app(app)
+profiler.init_app(app)
+app.register_blueprint(api)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+  'day': "EEEE MMMM d, y",
+}
+DATETIME_LOCALE = babel.Locale.parse(babel.dates.LC_TIME or 'en_US_POSIX')
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format):
+  # Compiled once per format instead of on every call.
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@functools.lru_cache(maxsize=65536)
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+  """Format a datetime, or a string holding one, with a babel pattern.
+
+  Results are memoized, as the same start times repeat across tiles.
+  """
+  if isinstance(value, str):
+    try:
+      value = datetime.fromisoformat(value)
+    except ValueError:
+      value = dateutil.parser.parse(value)
+  return datetime_pattern(format).apply(value, DATETIME_LOCALE)
 
 app.jinja_env.filters['datetime'] = format_datetime
+configure_templates(app)
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+def read_async():
+  # The async engine reads from the replica even for a client that just
+  # wrote; those reads go through the session, which uses the primary.
+  return async_reads.enabled and not wrote_recently(app)
+
+def paginate(query, columns, key, name=None):
+  # Lists paged side by side read their cursors from <name>_after/_before.
+  prefix = f'{name}_' if name else ''
+  args = dict(
+    after=request.args.get(prefix + 'after'),
+    before=request.args.get(prefix + 'before'),
+    per_page=app.config['ITEMS_PER_PAGE']
+  )
+  try:
+    if read_async():
+      return async_reads.run(async_reads.paginate(query, columns, key, **args))
+    return keyset_paginate(query, columns, key, **args)
+  except InvalidCursor:
+    abort(400)
 
 #----------------------------------------------------------------------------#
 # Controllers.
@@ -53,18 +126,26 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@response_cache.cached('venues')
 def venues():
-	distinct_city_states = Venue.query.distinct(Venue.city, Venue.state).all()
-	data = [cs.filter_on_city_state for cs in distinct_city_states]
-	return render_template('pages/venues.html', areas=data)
+	page = paginate(
+		Venue.query_with_num_shows(),
+		[Venue.state, Venue.city, Venue.name, Venue.id],
+		key=lambda row: (row[0].state, row[0].city, row[0].name, row[0].id)
+	)
+	data = Venue.group_by_city_state(page.items)
+	return render_template('pages/venues.html', areas=data, page=page)
 
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
-    search_term = request.form.get('search_term', None)
-    venues = Venue.query.filter(
-        Venue.name.ilike(f"%{search_term}%")
-	).all()
+    venues = search(
+        Venue, request.form.get('search_term', ''),
+        city=request.form.get('city'),
+        state=request.form.get('state'),
+        genre=request.form.get('genre'),
+        limit=app.config['SEARCH_RESULTS_LIMIT']
+    )
 
     response = {
         "count": len(venues),
@@ -75,64 +156,16 @@ def search_venues():
 		search_term=request.form.get('search_term', '')
 	)
 
-# @app.route('/venues/<int:venue_id>')
-# def show_venue(venue_id):
-#     venues = Venue.query.filter(Venue.id == venue_id).one_or_none()
-
-#     if venues is None:
-#         abort(404)
-
-#     data = venues.serialize_with_shows_details
-#     return render_template('pages/show_venue.html', venue=data)
-
 @app.route('/venues/<int:venue_id>')
+@response_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
-  
-  venue = Venue.query.get(venue_id)
-
-  if not venue: 
-    return render_template('errors/404.html')
-
-  upcoming_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now()).all()
-  upcoming_shows = []
-
-  past_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.now()).all()
-  past_shows = []
-
-  for show in past_shows_query:
-    past_shows.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  for show in upcoming_shows_query:
-    upcoming_shows.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S")    
-    })
-
-  data = {
-    "id": venue.id,
-    "name": venue.name,
-    "genres": venue.genres,
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_description,
-    "image_link": venue.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
+  if read_async():
+    data = async_reads.run(async_reads.load_details(Venue, venue_id, 'artist'))
+  else:
+    data = Venue.load_details(venue_id)
+
+  if data is None:
+    abort(404)
 
   return render_template('pages/show_venue.html', venue=data)
 
@@ -152,7 +185,7 @@ def create_venue_submission():
   try:
     new_venue = Venue(
       name=venue_form.name.data,
-      genres=json.dumps(venue_form.genres.data),
+      genres=venue_form.genres.data,
       address=venue_form.address.data,
       city=venue_form.city.data,
       state=venue_form.state.data,
@@ -174,25 +207,38 @@ def create_venue_submission():
 def delete_venue(venue_id):
     try:
         venue_to_delete = Venue.query.filter(Venue.id == venue_id).one()
-        venue_to_delete.delete()
-        flash(f"Venue {venue_to_delete[0]['name']} has been deleted successfully")
     except NoResultFound:
         abort(404)
 
+    name = venue_to_delete.name
+    if app.config['SOFT_DELETE_ENABLED']:
+        venue_to_delete.archive()
+    else:
+        venue_to_delete.delete()
+    flash(f'Venue {name} has been deleted successfully')
+    return jsonify({'success': True})
+
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached('artists')
 def artists():
-  artists = Artist.query.all()
-  data = [artist.serialize_with_shows_details for artist in artists]
-  return render_template('pages/artists.html', artists=data)
+  page = paginate(
+    Artist.query, [Artist.name, Artist.id],
+    key=lambda artist: (artist.name, artist.id)
+  )
+  data = [artist.serialize_with_show_counts for artist in page.items]
+  return render_template('pages/artists.html', artists=data, page=page)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
-  search_term = request.form.get('search_term', None)
-  artists = Artist.query.filter(
-    Artist.name.ilike(f"%{search_term}%")
-  ).all()
+  artists = search(
+    Artist, request.form.get('search_term', ''),
+    city=request.form.get('city'),
+    state=request.form.get('state'),
+    genre=request.form.get('genre'),
+    limit=app.config['SEARCH_RESULTS_LIMIT']
+  )
   response = {
       "count": len(artists),
       "data": [a.serialize for a in artists]
@@ -202,67 +248,16 @@ def search_artists():
     search_term=request.form.get('search_term', '')
   )
 
-# @app.route('/artists/<int:artist_id>')
-# def show_artist(artist_id):
-#   artist = Artist.query.filter(Artist.id == artist_id).one_or_none()
-
-#   if artist is None:
-#     abort(404)
-
-#   data = artist.serialize_with_shows_details
-#   return render_template('pages/show_artist.html', artist=data)
 @app.route('/artists/<int:artist_id>')
+@response_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
-  artist_query = db.session.query(Artist).get(artist_id)
-
-  if not artist_query: 
-    return render_template('errors/404.html')
-
-  past_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()
-  past_shows = []
-
-  for show in past_shows_query:
-    past_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()
-  upcoming_shows = []
-
-  for show in upcoming_shows_query:
-    upcoming_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-
-  data = {
-    "id": artist_query.id,
-    "name": artist_query.name,
-    "genres": artist_query.genres,
-    "city": artist_query.city,
-    "state": artist_query.state,
-    "phone": artist_query.phone,
-    "website": artist_query.website,
-    "facebook_link": artist_query.facebook_link,
-    "seeking_venue": artist_query.seeking_venue,
-    "seeking_description": artist_query.seeking_description,
-    "image_link": artist_query.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
+  if read_async():
+    data = async_reads.run(async_reads.load_details(Artist, artist_id, 'venue'))
+  else:
+    data = Artist.load_details(artist_id)
 
-  for k, v in locals().items():
-    print('-' * 10)
-    print(f"{k} : {v}")
-    print('-' * 10)
+  if data is None:
+    abort(404)
 
   return render_template('pages/show_artist.html', artist=data)
 
@@ -288,14 +283,15 @@ def edit_artist_submission(artist_id):
   form = ArtistForm(request.form)
   try:
     artist = Artist.query.filter_by(id=artist_id).one()
-    artist.name = form.name.data,
-    artist.genres = json.dumps(form.genres.data),
-    artist.city = form.city.data,
-    artist.state = form.state.data,
-    artist.phone = form.phone.data,
-    artist.facebook_link = form.facebook_link.data,
-    artist.image_link = form.image_link.data,
-    artist.save()
+    artist.update(
+      name=form.name.data,
+      genres=form.genres.data,
+      city=form.city.data,
+      state=form.state.data,
+      phone=form.phone.data,
+      facebook_link=form.facebook_link.data,
+      image_link=form.image_link.data
+    )
     flash(f'Artist {request.form["name"]} was successfully updated!')
   except Exception as e:
     flash(f'An error occurred. Artist {request.form["name"]} could not be updated.')
@@ -321,15 +317,16 @@ def edit_venue_submission(venue_id):
   form = VenueForm(request.form)
   try:
     venue = Venue.query.filter(Venue.id==venue_id).one()
-    venue.name = form.name.data,
-    venue.address = form.address.data,
-    venue.genres = json.dumps(form.genres.data),
-    venue.city = form.city.data,
-    venue.state = form.state.data,
-    venue.phone = form.phone.data,
-    venue.facebook_link = form.facebook_link.data,
-    venue.image_link = form.image_link.data,
-    venue.save()
+    venue.update(
+      name=form.name.data,
+      address=form.address.data,
+      genres=form.genres.data,
+      city=form.city.data,
+      state=form.state.data,
+      phone=form.phone.data,
+      facebook_link=form.facebook_link.data,
+      image_link=form.image_link.data
+    )
     flash(f'Venue {request.form["name"]} was successfully updated!')
   except Exception as e:
     flash(f'An error occurred. Venue {request.form["name"]} could not be updated.')
@@ -351,7 +348,7 @@ def create_artist_submission():
   try:
     new_artist = Artist(
       name=form.name.data,
-      genres=json.dumps(form.genres.data),
+      genres=form.genres.data,
       address=form.address.data,
       city=form.city.data,
       state=form.state.data,
@@ -369,14 +366,71 @@ def create_artist_submission():
   return render_template('pages/home.html')
 
 
+#  Genres
+#  ----------------------------------------------------------------
+
+@app.route('/genres/<genre>')
+def browse_genre(genre):
+  if genre not in [choice.value for choice in Genre]:
+    abort(404)
+
+  venue_page = paginate(
+    Venue.with_genre(genre), [Venue.name, Venue.id],
+    key=lambda venue: (venue.name, venue.id), name='venues'
+  )
+  artist_page = paginate(
+    Artist.with_genre(genre), [Artist.name, Artist.id],
+    key=lambda artist: (artist.name, artist.id), name='artists'
+  )
+  return render_template(
+    'pages/genre.html', genre=genre,
+    venues=[v.serialize for v in venue_page.items],
+    artists=[a.serialize for a in artist_page.items],
+    venue_page=venue_page, artist_page=artist_page
+  )
+
+
 #  Shows
 #  ----------------------------------------------------------------
 
+def show_tile(show):
+    # Tiles keep start_time as a datetime, so the filter needn't parse it.
+    return dict(
+        show.serialize_with_artist_venue,
+        start_time=show.start_time,
+        version=show.fragment_version
+    )
+
+def relative_window():
+    # Calendar windows default to starting now: their pages go stale by the
+    # minute, whatever gets saved.
+    return is_calendar_query(request.args) and not request.args.get('from')
+
 @app.route('/shows')
+@response_cache.cached('shows', unless=relative_window)
 def shows():
-    shows = Show.query.all()
-    data = [show.serialize_with_artist_venue for show in shows]
-    return render_template('pages/shows.html', shows=data)
+    if is_calendar_query(request.args):
+        return shows_calendar()
+
+    page = paginate(
+        Show.query_with_artist_venue(), [Show.start_time, Show.id],
+        key=lambda show: (show.start_time, show.id)
+    )
+    data = [show_tile(show) for show in page.items]
+    return render_template('pages/shows.html', shows=data, page=page)
+
+def shows_calendar():
+    """Shows of a time window, by day, filtered by place and genre."""
+    try:
+        window = parse_window(request.args, app.config['CALENDAR_MAX_DAYS'])
+    except InvalidWindow:
+        abort(400)
+
+    days = [
+        (day, [show_tile(show) for show in day_shows])
+        for day, day_shows in group_by_day(Show.in_window(**window))
+    ]
+    return render_template('pages/shows.html', days=days, window=window)
 
 @app.route('/shows/create')
 def create_shows():
@@ -391,8 +445,20 @@ def create_show_submission():
         show = Show(
             artist_id=show_form.artist_id.data,
             venue_id=show_form.venue_id.data,
-            start_time=show_form.start_time.data
+            start_time=show_form.start_time.data,
+            end_time=show_form.end_time.data
         )
+        try:
+            show.validate_times()
+        except ValueError as e:
+            flash(f'Show could not be listed: {e}')
+            return render_template('forms/new_show.html', form=show_form)
+        conflict = Show.conflicts([show]).get(0)
+        if conflict:
+            booked = ', '.join(f'#{other.id}' for other in conflict['shows'])
+            flash('Show could not be listed: the artist or the venue is '
+                  f'already booked at that time (show {booked}).')
+            return render_template('forms/new_show.html', form=show_form)
         show.save()
         flash('Show was successfully listed!')
     except Exception as e:
@@ -402,6 +468,20 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
+@app.route('/metrics')
+def metrics():
+    return Response(
+        pool_metrics.prometheus() + profiler.prometheus()
+        + fragment_cache.prometheus(),
+        mimetype='text/plain; version=0.0.4'
+    )
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(dict(response_cache.stats, fragments=fragment_cache.stats))
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -421,6 +501,238 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('check-plans')
+def check_plans_command():
+    """Fail if a hot query's plan falls back to a full table scan."""
+    failures = check_plans()
+    for name, scans in failures.items():
+        click.echo(f'{name}: {", ".join(scans)}', err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo('No full table scans in hot query plans.')
+
+
+@app.cli.command('roll-over-shows')
+def roll_over_shows_command():
+    """Move started shows into the past show counters; run it from cron."""
+    click.echo(f'{Show.roll_over()} shows rolled over.')
+
+
+@app.cli.command('purge-archived')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows deleted per transaction.')
+@click.option('--min-age-hours', default=0, show_default=True,
+              help='Only purge what was archived at least this long ago.')
+def purge_archived_command(batch_size, min_age_hours):
+    """Delete archived venues and artists with their shows; run it from cron."""
+    before = datetime.utcnow() - timedelta(hours=min_age_hours)
+    for table, count in purge_archived(batch_size, before).items():
+        click.echo(f'{count} archived {table.lower()}s purged.')
+
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows validated and committed per transaction.')
+def import_data_command(kind, source, fmt, chunk_size):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    if fmt is None:
+        fmt = 'jsonl' if source.name.endswith(('.jsonl', '.json')) else 'csv'
+
+    def progress(imported, errors, elapsed):
+        rate = imported / elapsed if elapsed else 0
+        click.echo(f'{imported} {kind} imported, {errors} rejected '
+                   f'({rate:.0f} rows/s)')
+
+    imported, errors = import_rows(
+        kind, read_rows(source, fmt), chunk_size, progress
+    )
+    for line_num, message in errors:
+        click.echo(f'line {line_num}: {message}', err=True)
+    click.echo(f'Done: {imported} {kind} imported, {len(errors)} rejected.')
+
+
+@app.cli.command('export-shows')
+@click.argument('destination', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True,
+              help='Gzip the output (implied by a .gz destination).')
+@click.option('--since', type=click.DateTime(),
+              help='Only export shows changed at or after this UTC time.')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows fetched per round trip from the server-side cursor.')
+def export_shows_command(destination, fmt, compress, since, batch_size):
+    """Export shows with their artist and venue as CSV or JSONL."""
+    started = time.monotonic()
+    if compress or destination.endswith('.gz'):
+        out = gzip.open(
+            sys.stdout.buffer if destination == '-' else destination,
+            'wt', newline=''
+        )
+    elif destination == '-':
+        out = sys.stdout
+    else:
+        out = open(destination, 'w', newline='')
+
+    try:
+        count = export_shows(out, fmt, since, batch_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    click.echo(f'Exported {count} shows in {time.monotonic() - started:.1f}s.',
+               err=True)
+
+
+@app.cli.command('seed-data')
+@click.option('--venues', default=100, show_default=True)
+@click.option('--artists', default=200, show_default=True)
+@click.option('--shows', default=2000, show_default=True)
+@click.option('--seed', default=0, show_default=True,
+              help='Random seed; the same seed generates the same data.')
+@click.option('--create-tables', is_flag=True,
+              help='Create missing tables first, for a scratch database.')
+def seed_data_command(venues, artists, shows, seed, create_tables):
+    """Fill the database with generated venues, artists and shows."""
+    if create_tables:
+        db.create_all()
+    counts = seed_data(venues, artists, shows, seed)
+    click.echo(', '.join(f'{count} {kind}' for kind, count in counts.items())
+               + ' generated.')
+
+
+@app.cli.command('benchmark')
+@click.option('--iterations', default=20, show_default=True,
+              type=click.IntRange(min=1), help='Timed requests per route.')
+@click.option('--output', type=click.File('w'),
+              help='Write the results as JSON, to be used as a baseline.')
+@click.option('--baseline', type=click.File('r'),
+              help='Fail if a route regressed against these results.')
+@click.option('--threshold', default=0.2, show_default=True,
+              help='Relative growth in p95 latency or memory that counts '
+                   'as a regression.')
+@click.option('--cached', is_flag=True,
+              help='Keep the response cache on while measuring.')
+def benchmark_command(iterations, output, baseline, threshold, cached):
+    """Measure latency, queries and peak memory of every route.
+
+    Runs against the configured database; point DATABASE_URL at SQLite or
+    Postgres to compare them.
+    """
+    results = run_benchmark(app, iterations, cached)
+    info = results['info']
+    click.echo(f"{info['database']}: {info['venues']} venues, "
+               f"{info['artists']} artists, {info['shows']} shows")
+    click.echo(f"{'route':<40} {'status':>6} {'p50':>8} {'p95':>8} "
+               f"{'p99':>8} {'queries':>8} {'peak KiB':>9}")
+    for route, r in results['routes'].items():
+        click.echo(f"{route:<40} {r['status']:>6} {r['p50_ms']:>8.1f} "
+                   f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                   f"{r['queries']:>8g} {r['peak_kib']:>9.0f}")
+
+    if output:
+        json.dump(results, output, indent=2)
+    if baseline:
+        regressions = compare(results, json.load(baseline), threshold)
+        for regression in regressions:
+            click.echo(regression, err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo('No regressions against the baseline.')
+
+
+@app.cli.command('benchmark-datetime')
+@click.option('--count', default=100000, show_default=True)
+def benchmark_datetime_command(count):
+    """Time the datetime template filter against parsing and formatting."""
+    for name, seconds in benchmark_datetime_filter(
+        format_datetime, count
+    ).items():
+        click.echo(f'{name:<28} {seconds:7.3f}s '
+                   f'{seconds / count * 1e6:8.2f}us per value')
+
+
+@app.cli.command('benchmark-writes')
+@click.option('--rows', default=10000, show_default=True)
+def benchmark_writes_command(rows):
+    """Time venue edits committed one by one and in one unit of work."""
+    for approach, result in benchmark_writes(rows).items():
+        click.echo(f"{approach:<18} {result['rows']} rows in "
+                   f"{result['seconds']:7.3f}s {result['rows_per_s']:9.1f} "
+                   f"rows/s {result['commits_per_s']:9.1f} commits/s")
+
+
+@app.cli.command('benchmark-shows')
+def benchmark_shows_command():
+    """Time serializing every show with per-show lookups and eager loading."""
+    for approach, result in benchmark_show_serialization().items():
+        click.echo(f"{approach:<18} {result['shows']} shows in "
+                   f"{result['seconds']:7.3f}s {result['queries']:>7} queries")
+
+
+@app.cli.command('benchmark-search')
+@click.option('--searches', default=100, show_default=True)
+def benchmark_search_command(searches):
+    """Time venue and artist searches; seed 100k of each first."""
+    for name, result in benchmark_search(
+        searches, limit=app.config['SEARCH_RESULTS_LIMIT']
+    ).items():
+        click.echo(f"{name:<18} {result['rows']:>7} rows "
+                   f"{result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+                   f"{result['p99_ms']:8.2f} ms (p50 p95 p99)")
+
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Fill TEMPLATE_CACHE_DIR with every compiled template."""
+    if not app.config.get('TEMPLATE_CACHE_DIR'):
+        raise click.UsageError('TEMPLATE_CACHE_DIR is not set.')
+    count = compile_templates(app.jinja_env)
+    click.echo(f'{count} templates compiled into '
+               f"{app.config['TEMPLATE_CACHE_DIR']}.")
+
+
+@app.cli.command('benchmark-templates')
+@click.option('--renders', default=1000, show_default=True)
+def benchmark_templates_command(renders):
+    """Time template loading and rendering with and without the cache."""
+    for name, seconds in benchmark_templates(app, renders=renders).items():
+        click.echo(f'{name:<34} {seconds * 1000:9.3f}ms')
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress the CSS and JS."""
+    for name, path in build_assets(app.static_folder).items():
+        click.echo(f'{name} -> {path}')
+
+
+@app.cli.command('benchmark-async')
+@click.option('--concurrency', default=32, show_default=True)
+@click.option('--requests', 'total', default=500, show_default=True)
+def benchmark_async_command(concurrency, total):
+    """Compare read route throughput of the sync and async paths."""
+    if async_reads.engine is None:
+        async_reads.create_engine(app)
+
+    enabled = async_reads.enabled
+    try:
+        for mode in (False, True):
+            async_reads.enabled = mode
+            rate = load_test(app, concurrency, total)
+            click.echo(f"{'async' if mode else 'sync':<6} {rate:8.1f} req/s "
+                       f'at concurrency {concurrency}')
+    finally:
+        async_reads.enabled = enabled
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+
+
+# Bundles built by `flask build-assets`, as name: source files under static/.
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'body.js': [
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/script.js',
+    ],
+}
+# Bundles sit one directory below static/, like the css/ sources, so their
+# relative url()s still resolve.
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+DIGEST_LENGTH = 12
+# Only content-hashed bundles are immutable; the manifest is rewritten in
+# place by every build.
+HASHED_BUNDLE = re.compile(
+    rf'^{DIST}/[^/]+\.[0-9a-f]{{{DIGEST_LENGTH}}}\.(css|js)$'
+)
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(css):
+    css = CSS_COMMENT.sub('', css)
+    css = CSS_SPACE.sub(' ', css)
+    css = CSS_PUNCTUATION.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Minified with `rjsmin` when it is installed, unchanged otherwise;
+    the vendored libraries are minified already."""
+    try:
+        import rjsmin
+    except ImportError:
+        return js
+    return rjsmin.jsmin(js)
+
+
+def _compress(path, data):
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, 9))
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(data))
+
+
+def build_assets(static_folder):
+    """Write every bundle, minified, under a content-hashed name with
+    precompressed variants, and the manifest mapping names to them.
+
+    Returns the manifest.
+    """
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source)) as f:
+                parts.append(f.read())
+
+        stem, ext = os.path.splitext(name)
+        if ext == '.css':
+            data = '\n'.join(minify_css(part) for part in parts)
+        else:
+            data = ';\n'.join(minify_js(part) for part in parts)
+        data = data.encode()
+
+        digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+        filename = f'{stem}.{digest}{ext}'
+        path = os.path.join(dist, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+        _compress(path, data)
+        manifest[name] = f'{DIST}/{filename}'
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class Assets:
+    """Template helper and static file serving for the built bundles.
+
+    `asset_urls(name)` gives the hashed bundle once `flask build-assets`
+    has run, and the individual sources before that, so development needs
+    no build step. Bundles are served precompressed when the client
+    accepts it, with a far-future immutable Cache-Control.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        path = os.path.join(app.static_folder, DIST, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+
+        app.jinja_env.globals['asset_urls'] = self.urls
+        app.view_functions['static'] = self.send_static_file
+
+    def urls(self, name):
+        if name in self.manifest:
+            return [url_for('static', filename=self.manifest[name])]
+        return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+    def send_static_file(self, filename):
+        static_folder = current_app.static_folder
+        if not HASHED_BUNDLE.match(filename):
+            return current_app.send_static_file(filename)
+
+        accepted = request.accept_encodings
+        for encoding, suffix in [('br', '.br'), ('gzip', '.gz')]:
+            if accepted[encoding] and os.path.exists(
+                os.path.join(static_folder, filename + suffix)
+            ):
+                response = send_from_directory(
+                    static_folder, filename + suffix,
+                    mimetype=_mimetype(filename)
+                )
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(static_folder, filename)
+
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+
+def _mimetype(filename):
+    return 'text/css' if filename.endswith('.css') else 'text/javascript'
+
+
+assets = Assets()
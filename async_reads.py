@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from model import Show, serialize_detail
+from pagination import keyset_query, keyset_page
+
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+class AsyncReads:
+    """Read path running its queries on SQLAlchemy's asyncio engine.
+
+    Enabled by ASYNC_READS_ENABLED, it needs `asyncpg` (or `aiosqlite`).
+    Views stay synchronous: they hand their reads to one event loop per
+    process, running in a background thread, and wait for the result.
+    That loop multiplexes the queries of every request thread over a
+    single connection pool, and the independent queries of a page - such
+    as a detail page's entity, past and upcoming shows - go to the
+    database concurrently instead of one after another.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.engine = None
+        self._loop = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ASYNC_READS_ENABLED', False)
+        if self.enabled:
+            self.create_engine(app)
+
+    def create_engine(self, app):
+        url = make_url(
+            app.config.get('SQLALCHEMY_READ_REPLICA_URI')
+            or app.config['SQLALCHEMY_DATABASE_URI']
+        )
+        backend = url.get_backend_name()
+        options = {}
+        if backend != 'sqlite':
+            options.update(
+                pool_size=app.config['DB_POOL_SIZE'],
+                max_overflow=app.config['DB_MAX_OVERFLOW'],
+                pool_timeout=app.config['DB_POOL_TIMEOUT'],
+                pool_recycle=app.config['DB_POOL_RECYCLE'],
+                pool_pre_ping=app.config['DB_POOL_PRE_PING'],
+            )
+        self.engine = create_async_engine(
+            url.set(drivername=ASYNC_DRIVERS[backend]), **options
+        )
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name='async-reads', daemon=True
+        ).start()
+
+    def run(self, coroutine):
+        """Run `coroutine` on the read loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _execute(self, statement, scalars=True):
+        # A session per statement: each needs its own connection to run
+        # concurrently with the others.
+        async with AsyncSession(self.engine) as session:
+            result = (await session.execute(statement)).unique()
+            return result.scalars().all() if scalars else result.all()
+
+    async def paginate(self, query, columns, key, after=None, before=None,
+                       per_page=50):
+        """`keyset_paginate` of an ORM query, run on the async engine."""
+        statement = keyset_query(
+            query, columns, after, before, per_page
+        ).statement
+        rows = await self._execute(
+            statement, scalars=len(query.column_descriptions) == 1
+        )
+        return keyset_page(rows, key, after, before, per_page)
+
+    async def load_details(self, cls, entity_id, counterpart):
+        """`load_with_shows` with the entity, its past shows and its
+        upcoming shows fetched concurrently."""
+        now = datetime.datetime.now()
+        shows = select(Show).options(
+            joinedload(getattr(Show, counterpart))
+        ).where(
+            getattr(Show, f'{cls.__name__.lower()}_id') == entity_id
+        ).order_by(Show.start_time)
+
+        entities, past_shows, upcoming_shows = await asyncio.gather(
+            self._execute(select(cls).where(cls.id == entity_id)),
+            self._execute(shows.where(Show.start_time < now)),
+            self._execute(shows.where(Show.start_time > now)),
+        )
+        if not entities:
+            return None
+        return serialize_detail(
+            entities[0], counterpart, past_shows, upcoming_shows
+        )
+
+
+async_reads = AsyncReads()
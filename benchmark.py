@@ -0,0 +1,435 @@
+import datetime
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import babel.dates
+import dateutil.parser
+
+from flask import url_for
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from cache import response_cache
+from enums import State, Genre
+from importer import import_rows
+from model import (
+    db, Venue, Artist, Show, unit_of_work, SHOW_DEFAULT_DURATION
+)
+from search import search
+
+
+CITIES_PER_STATE = 3
+READ_ROUTES = [
+    'GET /venues', 'GET /artists', 'GET /shows',
+    'GET /venues/<int:venue_id>', 'GET /artists/<int:artist_id>',
+]
+SEARCH_TERM = 'the'
+
+
+def _entity_rows(rng, kind, count):
+    states = [choice.value for choice in State]
+    genres = [choice.value for choice in Genre]
+    for i in range(1, count + 1):
+        state = rng.choice(states)
+        yield i, {
+            'name': f'The {kind.title()} {i}',
+            'city': f'{state} City {rng.randrange(CITIES_PER_STATE)}',
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} Main Street',
+            'phone': f'{rng.randint(200, 999)}-555-{rng.randint(0, 9999):04d}',
+            'image_link': f'https://example.com/{kind}/{i}.jpg',
+            'website': f'https://example.com/{kind}/{i}',
+            'seeking_talent': rng.random() < 0.5,
+            'seeking_venue': rng.random() < 0.5,
+            'genres': rng.sample(genres, rng.randint(1, 3)),
+        }
+
+
+def _show_rows(rng, count, venue_ids, artist_ids):
+    """Shows of the default duration, in slots of that length, so no venue
+    or artist is booked twice at a time."""
+    now = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+    slots = int(datetime.timedelta(days=365) / SHOW_DEFAULT_DURATION)
+    booked = set()
+    for i in range(1, count + 1):
+        while True:
+            slot = rng.randint(-slots, slots)
+            venue_id = rng.choice(venue_ids)
+            artist_id = rng.choice(artist_ids)
+            if ('venue', venue_id, slot) not in booked \
+                    and ('artist', artist_id, slot) not in booked:
+                break
+        booked.update({('venue', venue_id, slot), ('artist', artist_id, slot)})
+        yield i, {
+            'start_time': (now + slot * SHOW_DEFAULT_DURATION).isoformat(),
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+        }
+
+
+def seed_data(venues, artists, shows, seed=0, chunk_size=1000):
+    """Insert generated venues, artists and shows; the same seed gives the
+    same data. Shows spread over the year before and after now.
+
+    Returns {kind: rows imported}.
+    """
+    rng = random.Random(seed)
+    counts = {
+        'venues': import_rows(
+            'venues', _entity_rows(rng, 'venue', venues), chunk_size
+        )[0],
+        'artists': import_rows(
+            'artists', _entity_rows(rng, 'artist', artists), chunk_size
+        )[0],
+    }
+
+    venue_ids = [venue_id for (venue_id,) in db.session.query(Venue.id)]
+    artist_ids = [artist_id for (artist_id,) in db.session.query(Artist.id)]
+    counts['shows'] = import_rows(
+        'shows', _show_rows(rng, shows, venue_ids, artist_ids), chunk_size
+    )[0] if venue_ids and artist_ids else 0
+    return counts
+
+
+def _busiest(column):
+    """Id with the most shows, so detail pages are measured at their worst."""
+    return db.session.query(column).group_by(column).order_by(
+        db.func.count(Show.id).desc(), column
+    ).limit(1).scalar()
+
+
+def benchmark_requests(app):
+    """(route, method, url, form data) of every route that can be requested
+    without side effects, with ids taken from the current data."""
+    arguments = {
+        'venue_id': _busiest(Show.venue_id),
+        'artist_id': _busiest(Show.artist_id),
+        'show_id': db.session.query(db.func.min(Show.id)).scalar(),
+        'genre': next(iter(Genre)).value,
+    }
+
+    requests = []
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            if rule.endpoint == 'static' or 'GET' not in rule.methods:
+                continue
+            if any(arguments.get(arg) is None for arg in rule.arguments):
+                continue
+            url = url_for(
+                rule.endpoint, **{arg: arguments[arg] for arg in rule.arguments}
+            )
+            requests.append((f'GET {rule.rule}', 'GET', url, None))
+
+    for url in ('/venues/search', '/artists/search'):
+        requests.append(
+            (f'POST {url}', 'POST', url, {'search_term': SEARCH_TERM})
+        )
+    return requests
+
+
+def _percentile(ordered, percent):
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def measure_route(client, method, url, data, iterations):
+    """Latency percentiles, queries per request and peak memory of a route.
+
+    Peak memory is traced in a separate request, tracemalloc being too slow
+    to leave on while timing.
+    """
+    queries = []
+
+    def count_query(*args):
+        queries.append(1)
+
+    client.open(url, method=method, data=data).get_data()
+
+    durations = []
+    event.listen(Engine, 'after_cursor_execute', count_query)
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+            durations.append(time.perf_counter() - started)
+    finally:
+        event.remove(Engine, 'after_cursor_execute', count_query)
+
+    tracemalloc.start()
+    try:
+        client.open(url, method=method, data=data).get_data()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'status': response.status_code,
+        'p50_ms': _percentile(durations, 50) * 1000,
+        'p95_ms': _percentile(durations, 95) * 1000,
+        'p99_ms': _percentile(durations, 99) * 1000,
+        'queries': len(queries) / iterations,
+        'peak_kib': peak / 1024,
+    }
+
+
+def run_benchmark(app, iterations=20, cache=False):
+    """Measure every route against the configured database.
+
+    The response cache is turned off unless `cache` is set, so the
+    numbers reflect the queries and rendering behind each page.
+    """
+    with app.app_context():
+        requests = benchmark_requests(app)
+        info = {
+            'database': db.engine.dialect.name,
+            'venues': Venue.query.count(),
+            'artists': Artist.query.count(),
+            'shows': Show.query.count(),
+            'iterations': iterations,
+        }
+
+    enabled = response_cache.enabled
+    response_cache.enabled = cache
+    try:
+        client = app.test_client()
+        routes = {
+            route: measure_route(client, method, url, data, iterations)
+            for route, method, url, data in requests
+        }
+    finally:
+        response_cache.enabled = enabled
+    return {'info': info, 'routes': routes}
+
+
+def load_test(app, concurrency=32, total=500, routes=READ_ROUTES):
+    """Requests per second when `concurrency` threads of one process share
+    `total` requests to `routes`, the response cache being off."""
+    with app.app_context():
+        requests = [
+            request for request in benchmark_requests(app)
+            if request[0] in routes
+        ]
+
+    def send(i):
+        _, method, url, data = requests[i % len(requests)]
+        app.test_client().open(url, method=method, data=data).get_data()
+
+    enabled = response_cache.enabled
+    response_cache.enabled = False
+    try:
+        with ThreadPoolExecutor(concurrency) as pool:
+            started = time.perf_counter()
+            list(pool.map(send, range(total)))
+            elapsed = time.perf_counter() - started
+    finally:
+        response_cache.enabled = enabled
+    return total / elapsed
+
+
+def compare(results, baseline, threshold=0.2, slack_ms=1.0):
+    """Regressions of `results` against `baseline`, as messages.
+
+    A route regresses when its p95 latency or peak memory grew by more
+    than `threshold` (latency also by more than `slack_ms`, to ignore
+    jitter on fast routes), or when it runs more queries.
+    """
+    regressions = []
+    for route, now in results['routes'].items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            continue
+
+        if now['p95_ms'] > before['p95_ms'] * (1 + threshold) \
+                and now['p95_ms'] - before['p95_ms'] > slack_ms:
+            regressions.append(
+                f"{route}: p95 {before['p95_ms']:.1f}ms -> {now['p95_ms']:.1f}ms"
+            )
+        if now['queries'] > before['queries']:
+            regressions.append(
+                f"{route}: {before['queries']:g} -> {now['queries']:g} queries"
+            )
+        if now['peak_kib'] > before['peak_kib'] * (1 + threshold):
+            regressions.append(
+                f"{route}: peak memory {before['peak_kib']:.0f}KiB -> "
+                f"{now['peak_kib']:.0f}KiB"
+            )
+    return regressions
+
+
+def benchmark_writes(rows=10000):
+    """Rows and commits per second of editing `rows` venues, committing
+    each edit and grouping them all in one unit of work.
+
+    The edits overwrite the venues' seeking_description, so run it against
+    seeded data. Returns {approach: {rows, seconds, rows_per_s,
+    commits_per_s}}.
+    """
+    ids = [
+        venue_id for (venue_id,) in
+        db.session.query(Venue.id).order_by(Venue.id).limit(rows)
+    ]
+    results = {}
+
+    # Each edit loads its venue and commits, as the edit form does.
+    started = time.perf_counter()
+    for i, venue_id in enumerate(ids):
+        Venue.query.get(venue_id).update(seeking_description=f'row {i}')
+    results['commit per row'] = time.perf_counter() - started
+    db.session.expunge_all()
+
+    started = time.perf_counter()
+    with unit_of_work():
+        for i, venue in enumerate(Venue.query.filter(Venue.id.in_(ids))):
+            venue.update(seeking_description=f'batch {i}')
+    results['one unit of work'] = time.perf_counter() - started
+
+    return {
+        approach: {
+            'rows': len(ids),
+            'seconds': seconds,
+            'rows_per_s': len(ids) / seconds,
+            'commits_per_s': commits / seconds,
+        }
+        for (approach, seconds), commits in zip(results.items(), [len(ids), 1])
+    }
+
+
+def _reference_serialize_show(show):
+    """Show serialization as it was: a venue and an artist query per show."""
+    return {
+        'id': show.id,
+        'venue': [v.serialize for v in Venue.query.filter(
+            Venue.id == show.venue_id
+        ).all()][0],
+        'artist': [a.serialize for a in Artist.query.filter(
+            Artist.id == show.artist_id
+        ).all()][0],
+        'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
+    }
+
+
+def benchmark_show_serialization():
+    """Time and queries to serialize every show with its venue and artist,
+    by approach; seed about 10k shows first.
+
+    Returns {approach: {shows, seconds, queries}}.
+    """
+    approaches = {
+        'lookups per show': (Show.query, _reference_serialize_show),
+        'eager loaded': (
+            Show.query_with_artist_venue(),
+            lambda show: show.serialize_with_artist_venue
+        ),
+    }
+    results = {}
+    for name, (query, serialize) in approaches.items():
+        queries = []
+
+        def count_query(*args):
+            queries.append(1)
+
+        db.session.expunge_all()
+        event.listen(Engine, 'after_cursor_execute', count_query)
+        try:
+            started = time.perf_counter()
+            shows = [serialize(show) for show in query.order_by(Show.id)]
+            seconds = time.perf_counter() - started
+        finally:
+            event.remove(Engine, 'after_cursor_execute', count_query)
+        results[name] = {
+            'shows': len(shows), 'seconds': seconds, 'queries': len(queries)
+        }
+    return results
+
+
+def benchmark_search(searches=100, seed=0, limit=50):
+    """Latency of venue and artist searches over the current data, by term.
+
+    Meant for large tables, e.g. after `flask seed-data --venues 100000
+    --artists 100000`. Selective terms match a generated name or two;
+    SEARCH_TERM matches every name, so all of them are ranked before the
+    limit applies, and is also searched within a state and a genre.
+    Returns {'<model> <term>': {rows, p50_ms, p95_ms, p99_ms}}.
+    """
+    rng = random.Random(seed)
+    states = [choice.value for choice in State]
+    genres = [choice.value for choice in Genre]
+    results = {}
+
+    for model in (Venue, Artist):
+        rows = model.query.count()
+        terms = {
+            'selective': lambda: {
+                'term': f'{model.__name__} {rng.randint(1, max(rows, 1))}'
+            },
+            'common': lambda: {'term': SEARCH_TERM},
+            'filtered': lambda: {
+                'term': SEARCH_TERM,
+                'state': rng.choice(states),
+                'genre': rng.choice(genres),
+            },
+        }
+        for name, arguments in terms.items():
+            timings = []
+            for _ in range(searches):
+                kwargs = arguments()
+                started = time.perf_counter()
+                search(model, limit=limit, **kwargs)
+                timings.append((time.perf_counter() - started) * 1000)
+            db.session.expunge_all()
+            timings.sort()
+            results[f'{model.__name__.lower()} {name}'] = {
+                'rows': rows,
+                **{
+                    f'p{percent}_ms': _percentile(timings, percent)
+                    for percent in (50, 95, 99)
+                },
+            }
+    return results
+
+
+def _reference_format_datetime(value, format):
+    """The datetime filter as it was: parse, then format from the pattern."""
+    return babel.dates.format_datetime(dateutil.parser.parse(value), format)
+
+
+def benchmark_datetime_filter(format_datetime, count=100000, seed=0,
+                              format='full'):
+    """Seconds taken to format `count` show start times, by approach.
+
+    `format_datetime` is the memoized template filter.
+    Start times fall on hour slots over two years, so values repeat the way
+    they do across show tiles.
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime(2020, 1, 1)
+    values = [
+        start + datetime.timedelta(hours=rng.randrange(2 * 8760))
+        for _ in range(count)
+    ]
+    strings = [value.strftime('%Y-%m-%d %H:%M:%S') for value in values]
+    pattern = "EEEE MMMM, d, y 'at' h:mma"
+
+    def timed(function, items):
+        # Each approach starts from an empty memo.
+        format_datetime.cache_clear()
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        return time.perf_counter() - started
+
+    return {
+        'reference (parse + format)': timed(
+            lambda value: _reference_format_datetime(value, pattern), strings
+        ),
+        'filter on strings': timed(
+            lambda value: format_datetime(value, format), strings
+        ),
+        'filter on datetimes': timed(
+            lambda value: format_datetime(value, format), values
+        ),
+    }
@@ -0,0 +1,255 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, session
+from markupsafe import Markup
+
+
+class LRUBackend:
+    """In-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, tag, value = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tag=None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tag, value)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete_tag(self, tag):
+        with self._lock:
+            keys = self._tags.pop(tag, ())
+            for key in keys:
+                self._entries.pop(key, None)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        _, tag, _ = self._entries.pop(key)
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+class SharedBackend:
+    """Cache shared between workers, stored in a Redis-compatible client.
+
+    Only `get`, `setex`, `sadd`, `expire`, `smembers` and `delete` are used,
+    so any object implementing them (e.g. an in-memory stand-in) will do.
+    """
+
+    def __init__(self, client, ttl=300, prefix='fyyur:response:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value
+
+    def set(self, key, value, tag=None):
+        self.client.setex(self.prefix + key, self.ttl, value)
+        if tag is None:
+            return
+        tag_key = self.prefix + 'tag:' + tag
+        self.client.sadd(tag_key, key)
+        self.client.expire(tag_key, self.ttl)
+
+    def delete_tag(self, tag):
+        tag_key = self.prefix + 'tag:' + tag
+        keys = [
+            k.decode() if isinstance(k, bytes) else k
+            for k in self.client.smembers(tag_key)
+        ]
+        self.client.delete(tag_key, *[self.prefix + k for k in keys])
+        return len(keys)
+
+
+class ResponseCache:
+    """Rendered page cache for GET routes, invalidated by model writes.
+
+    Each cached view is registered under a tag such as 'venues' or
+    'artist:{artist_id}' (formatted with the view arguments). Every query
+    string variant of a page shares its tag, so `invalidate` drops all of
+    them at once.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+        if backend is None:
+            redis_url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+            if redis_url:
+                import redis
+                backend = SharedBackend(redis.Redis.from_url(redis_url), ttl)
+            else:
+                backend = LRUBackend(
+                    app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024), ttl
+                )
+
+        self.backend = backend
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+
+    def cached(self, tag, unless=None):
+        """Cache the view's pages under `tag`, except for requests that
+        `unless()` is true for, such as pages depending on the time."""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pages render pending flash messages, which are per user.
+                if not self.enabled or session.get('_flashes') \
+                        or (unless is not None and unless()):
+                    return view(*args, **kwargs)
+
+                view_tag = tag.format(**kwargs)
+                key = view_tag + '?' + request.query_string.decode()
+                body = self.backend.get(key)
+                if body is not None:
+                    self.hits += 1
+                    return body
+
+                self.misses += 1
+                body = view(*args, **kwargs)
+                if isinstance(body, str):
+                    self.backend.set(key, body, view_tag)
+                return body
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.invalidations += self.backend.delete_tag(tag)
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions if self.backend else 0,
+            'invalidations': self.invalidations,
+        }
+
+
+class FragmentCache:
+    """Rendered template fragments, such as the tiles of listing pages.
+
+    Templates wrap a fragment in ``{% call cached_fragment(kind, id,
+    version) %}``. The version is a stamp that changes whenever the entity
+    is saved, so edited entities simply miss and their stale fragments age
+    out of the cache; nothing needs invalidating.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        ttl = app.config.get('FRAGMENT_CACHE_TTL', 3600)
+        if backend is None:
+            redis_url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+            if redis_url:
+                import redis
+                backend = SharedBackend(
+                    redis.Redis.from_url(redis_url), ttl,
+                    prefix='fyyur:fragment:'
+                )
+            else:
+                backend = LRUBackend(
+                    app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000), ttl
+                )
+
+        self.backend = backend
+        self.enabled = app.config.get('FRAGMENT_CACHE_ENABLED', True)
+        app.jinja_env.globals['cached_fragment'] = self.fragment
+
+    def fragment(self, kind, entity_id, version, caller):
+        if not self.enabled:
+            return caller()
+
+        key = f'{kind}:{entity_id}@{version}'
+        html = self.backend.get(key)
+        if html is not None:
+            self.hits += 1
+            return Markup(html)
+
+        self.misses += 1
+        html = caller()
+        # Versioned keys are never deleted, only left to expire: untagged.
+        self.backend.set(key, str(html))
+        return html
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.backend.evictions if self.backend else 0,
+        }
+
+    def prometheus(self):
+        """Hit and miss counters in the Prometheus text exposition format."""
+        lines = []
+        for name, value in [('hits', self.hits), ('misses', self.misses)]:
+            metric = f'fyyur_fragment_cache_{name}_total'
+            lines.append(f'# HELP {metric} Template fragment cache {name}.')
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+response_cache = ResponseCache()
+fragment_cache = FragmentCache()
@@ -0,0 +1,207 @@
+import threading
+import time
+
+import flask_sqlalchemy
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, orm
+from sqlalchemy.pool import QueuePool
+
+
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+# Set on the responses to writes, so the client reads its own writes.
+WROTE_AT_COOKIE = 'wrote_at'
+
+
+def database_label(sa_url):
+    return f'{sa_url.host or "local"}/{sa_url.database or "memory"}'
+
+
+class PoolMetrics:
+    """Connection pool wait and checkout timings, per database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._stats = {}
+
+    def _observe(self, database, name, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(database, {})
+            count, total, highest = stats.get(name, (0, 0.0, 0.0))
+            stats[name] = (count + 1, total + seconds, max(highest, seconds))
+
+    def observe_wait(self, database, seconds):
+        self._observe(database, 'wait', seconds)
+
+    def observe_checkout(self, database, seconds):
+        self._observe(database, 'checkout', seconds)
+
+    def watch(self, database, engine):
+        """Record how long connections of `engine` are checked out."""
+        self._pools[database] = engine.pool
+
+        @event.listens_for(engine, 'checkout')
+        def on_checkout(dbapi_connection, record, proxy):
+            record.info['checked_out_at'] = time.perf_counter()
+
+        @event.listens_for(engine, 'checkin')
+        def on_checkin(dbapi_connection, record):
+            started = record.info.pop('checked_out_at', None)
+            if started is not None:
+                self.observe_checkout(database, time.perf_counter() - started)
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            stats = {db: dict(s) for db, s in self._stats.items()}
+
+        for name, help_text in [
+            ('wait', 'Time spent waiting for a pooled connection.'),
+            ('checkout', 'Time a pooled connection was held.'),
+        ]:
+            metric = f'fyyur_db_pool_{name}_seconds'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} summary')
+            for database, values in stats.items():
+                count, total, _ = values.get(name, (0, 0.0, 0.0))
+                label = f'{{database="{database}"}}'
+                lines.append(f'{metric}_count{label} {count}')
+                lines.append(f'{metric}_sum{label} {total:.6f}')
+
+            lines.append(f'# HELP {metric}_max Longest {name} observed.')
+            lines.append(f'# TYPE {metric}_max gauge')
+            for database, values in stats.items():
+                _, _, highest = values.get(name, (0, 0.0, 0.0))
+                lines.append(
+                    f'{metric}_max{{database="{database}"}} {highest:.6f}'
+                )
+
+        for name, help_text, read in [
+            ('checked_out', 'Connections currently checked out.',
+             lambda pool: pool.checkedout()),
+            ('overflow', 'Connections opened beyond pool_size.',
+             lambda pool: pool.overflow()),
+        ]:
+            metric = f'fyyur_db_pool_{name}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} gauge')
+            for database, pool in self._pools.items():
+                if isinstance(pool, QueuePool):
+                    lines.append(
+                        f'{metric}{{database="{database}"}} {read(pool)}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a slot."""
+
+    database = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.database = self.database
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.observe_wait(
+                self.database, time.perf_counter() - started
+            )
+
+
+def wrote_recently(app):
+    """Whether the client of the current request wrote to the database in
+    the last REPLICA_STICKY_SECONDS, which the replica may not have seen."""
+    try:
+        wrote_at = float(request.cookies.get(WROTE_AT_COOKIE, ''))
+    except ValueError:
+        return False
+    return time.time() - wrote_at < app.config['REPLICA_STICKY_SECONDS']
+
+
+class RoutingSession(flask_sqlalchemy.SignallingSession):
+    """Session reading from the replica while serving GET/HEAD requests.
+
+    Flushes, and everything outside of a read request (form submissions,
+    CLI commands), keep using the primary database. So do the reads of a
+    client that just wrote, such as the page a form redirects to: they
+    would otherwise see, and cache, the replica's older data.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.app.config.get('SQLALCHEMY_READ_REPLICA_URI') \
+                and not self._flushing and has_request_context() \
+                and request.method in READ_METHODS \
+                and not wrote_recently(self.app):
+            return flask_sqlalchemy.get_state(self.app).db.get_engine(
+                self.app, bind=REPLICA_BIND
+            )
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if has_request_context() and request.method not in READ_METHODS:
+        g.wrote_at = time.time()
+
+
+def _stick_to_primary(response):
+    wrote_at = g.get('wrote_at')
+    if wrote_at is not None:
+        response.set_cookie(
+            WROTE_AT_COOKIE, f'{wrote_at:.3f}', httponly=True,
+            max_age=current_app.config['REPLICA_STICKY_SECONDS']
+        )
+    return response
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """Flask-SQLAlchemy configured from the DB_* settings in config.py."""
+
+    def init_app(self, app):
+        replica_uri = app.config.get('SQLALCHEMY_READ_REPLICA_URI')
+        if replica_uri:
+            binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+            binds[REPLICA_BIND] = replica_uri
+            app.config['SQLALCHEMY_BINDS'] = binds
+            app.after_request(_stick_to_primary)
+        super().init_app(app)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername.startswith('sqlite'):
+            return sa_url, options
+
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=app.config['DB_POOL_SIZE'],
+            max_overflow=app.config['DB_MAX_OVERFLOW'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+            pool_recycle=app.config['DB_POOL_RECYCLE'],
+            pool_pre_ping=app.config['DB_POOL_PRE_PING'],
+        )
+        timeout = app.config['DB_STATEMENT_TIMEOUT_MS']
+        if timeout and sa_url.drivername.startswith('postgresql'):
+            connect_args = options.setdefault('connect_args', {})
+            connect_args['options'] = f'-c statement_timeout={timeout}'
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        database = database_label(sa_url)
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.database = database
+        pool_metrics.watch(database, engine)
+        return engine
@@ -0,0 +1,112 @@
+import datetime
+import json
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from model import (
+    db, detail_query, archived_criteria, proposed_bookings, Venue, Artist, Show
+)
+from search import search_query
+
+
+TABLES = {'Venue', 'Artist', 'Show', 'VenueGenre', 'ArtistGenre'}
+
+
+def hot_queries(per_page=50):
+    """The queries behind the listing, detail, search and genre pages."""
+    return {
+        'venues': Venue.query_with_num_shows().order_by(
+            Venue.state, Venue.city, Venue.name, Venue.id
+        ).limit(per_page),
+        'artists': Artist.query.order_by(
+            Artist.name, Artist.id
+        ).limit(per_page),
+        'shows': Show.query_with_artist_venue().order_by(
+            Show.start_time, Show.id
+        ).limit(per_page),
+        'show_venue': detail_query(Venue, 1, 'artist'),
+        'show_artist': detail_query(Artist, 1, 'venue'),
+        'shows_calendar': Show.in_window(
+            datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 8),
+            city='New York', state='NY', genre='Jazz'
+        ),
+        'show_conflicts': Show.conflicts_query(),
+        'artists_shows': Show.query_with_artist_venue().filter(
+            Show.artist_id.in_([1, 2, 3])
+        ).order_by(Show.start_time),
+        'search_venues': search_query(Venue, 'the').limit(per_page),
+        'search_artists': search_query(Artist, 'the').limit(per_page),
+        'genre_venues': Venue.with_genre('Jazz'),
+        'genre_artists': Artist.with_genre('Jazz'),
+    }
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, prefix, statement):
+        self.prefix = prefix
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return f'{element.prefix} {compiler.process(element.statement, **kw)}'
+
+
+def _execute(connection, prefix, query):
+    # Executed on a connection, the statement skips the session's hooks:
+    # hide archived rows here as the session does for the real query.
+    statement = query.statement
+    if not statement.get_execution_options().get('include_archived'):
+        statement = statement.options(*archived_criteria())
+    return connection.execute(Explain(prefix, statement))
+
+
+def _postgresql_scans(plan):
+    scans = []
+    if plan.get('Node Type') == 'Seq Scan' \
+            and plan.get('Relation Name') in TABLES:
+        scans.append(f"Seq Scan on {plan['Relation Name']}")
+    for child in plan.get('Plans', []):
+        scans.extend(_postgresql_scans(child))
+    return scans
+
+
+def full_scans(connection, query):
+    """Full table scans in the plan of `query` on one of our tables."""
+    if connection.dialect.name == 'postgresql':
+        plan = _execute(connection, 'EXPLAIN (FORMAT JSON)', query).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return _postgresql_scans(plan[0]['Plan'])
+
+    scans = []
+    for row in _execute(connection, 'EXPLAIN QUERY PLAN', query):
+        detail = row[-1]
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' \
+                and words[1] in TABLES and 'INDEX' not in detail:
+            scans.append(detail)
+    return scans
+
+
+def check_plans():
+    """Map of hot query name to the full scans found in its plan.
+
+    On PostgreSQL sequential scans are disabled for the check, so a
+    `Seq Scan` in a plan means no index can serve the query, whatever the
+    size of the dataset.
+    """
+    failures = {}
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        # Show.conflicts() creates it on its connections; this one too.
+        proposed_bookings.create(connection, checkfirst=True)
+        for name, query in hot_queries().items():
+            scans = full_scans(connection, query)
+            if scans:
+                failures[name] = scans
+    return failures
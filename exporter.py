@@ -0,0 +1,74 @@
+import csv
+import datetime
+import json
+
+from sqlalchemy import or_
+
+from model import db, Venue, Artist, Show
+
+
+COLUMNS = [
+    ('show_id', Show.id),
+    ('start_time', Show.start_time),
+    ('end_time', Show.end_time),
+    ('updated_at', Show.updated_at),
+    ('artist_id', Artist.id),
+    ('artist_name', Artist.name),
+    ('artist_city', Artist.city),
+    ('artist_state', Artist.state),
+    ('venue_id', Venue.id),
+    ('venue_name', Venue.name),
+    ('venue_city', Venue.city),
+    ('venue_state', Venue.state),
+    ('venue_address', Venue.address),
+]
+FIELDS = [name for name, _ in COLUMNS]
+
+
+def export_query(since=None, batch_size=1000):
+    """Flat show rows joined to their artist and venue, streamed in batches.
+
+    With `since`, only shows whose own row, artist or venue changed at or
+    after that time are included.
+    """
+    query = db.session.query(
+        *[column.label(name) for name, column in COLUMNS]
+    ).join(Artist, Show.artist_id == Artist.id).join(
+        Venue, Show.venue_id == Venue.id
+    )
+    if since is not None:
+        query = query.filter(or_(
+            Show.updated_at >= since,
+            Artist.updated_at >= since,
+            Venue.updated_at >= since
+        ))
+    # yield_per streams results through a server-side cursor.
+    return query.order_by(Show.id).yield_per(batch_size)
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def export_shows(out, fmt, since=None, batch_size=1000):
+    """Write every exported show row to the text stream `out`, one at a time.
+
+    Returns the number of rows written.
+    """
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(FIELDS)
+        for row in export_query(since, batch_size):
+            writer.writerow([_plain(value) for value in row])
+            count += 1
+    else:
+        for row in export_query(since, batch_size):
+            out.write(json.dumps(
+                {name: _plain(value) for name, value in zip(FIELDS, row)}
+            ))
+            out.write('\n')
+            count += 1
+    return count
@@ -0,0 +1,301 @@
+import csv
+import itertools
+import json
+import time
+
+import dateutil.parser
+
+from cache import response_cache
+from enums import State, Genre
+from model import (
+    db, Venue, Artist, Show, refresh_show_counts, SHOW_DEFAULT_DURATION
+)
+from schedule import local_time
+
+
+STATES = {choice.value for choice in State}
+GENRES = {choice.value for choice in Genre}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(stream, fmt):
+    """(line number, row dict) pairs read lazily from a CSV or JSONL stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_num, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_num, RowError('not a JSON object')
+        else:
+            yield line_num, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(row, field, required=False):
+    value = row.get(field)
+    if isinstance(value, str):
+        value = value.strip() or None
+    if value is None and required:
+        raise RowError(f'{field} is required')
+    return value
+
+
+def _bool(row, field):
+    value = row.get(field)
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_VALUES
+    return bool(value)
+
+
+def _state(row):
+    state = _text(row, 'state', required=True)
+    if state not in STATES:
+        raise RowError(f'invalid state {state!r}')
+    return state
+
+
+def _genres(row):
+    genres = row.get('genres') or []
+    if isinstance(genres, str):
+        # CSV cells hold either a JSON list or a ';' separated list.
+        try:
+            genres = json.loads(genres)
+        except ValueError:
+            genres = genres.split(';')
+    if not isinstance(genres, list):
+        raise RowError('genres must be a list')
+
+    genres = list(dict.fromkeys(
+        g.strip() for g in genres if isinstance(g, str) and g.strip()
+    ))
+    invalid = [g for g in genres if g not in GENRES]
+    if invalid:
+        raise RowError(f'invalid genres {", ".join(invalid)}')
+    return genres
+
+
+def _reference(row, kind):
+    ref_id = _text(row, f'{kind}_id')
+    if ref_id is not None:
+        try:
+            return int(ref_id)
+        except ValueError:
+            raise RowError(f'invalid {kind}_id {ref_id!r}')
+
+    name = _text(row, f'{kind}_name')
+    if name is None:
+        raise RowError(f'{kind}_id or {kind}_name is required')
+    return name
+
+
+def venue_values(row):
+    return {
+        'name': _text(row, 'name', required=True),
+        'city': _text(row, 'city', required=True),
+        'state': _state(row),
+        'address': _text(row, 'address', required=True),
+        'phone': _text(row, 'phone'),
+        'image_link': _text(row, 'image_link'),
+        'facebook_link': _text(row, 'facebook_link'),
+        'website': _text(row, 'website'),
+        'seeking_talent': _bool(row, 'seeking_talent'),
+        'seeking_description': _text(row, 'seeking_description'),
+        'genres': _genres(row),
+    }
+
+
+def artist_values(row):
+    return {
+        'name': _text(row, 'name', required=True),
+        'city': _text(row, 'city', required=True),
+        'state': _state(row),
+        'address': _text(row, 'address'),
+        'phone': _text(row, 'phone'),
+        'image_link': _text(row, 'image_link'),
+        'facebook_link': _text(row, 'facebook_link'),
+        'website': _text(row, 'website'),
+        'seeking_venue': _bool(row, 'seeking_venue'),
+        'seeking_description': _text(row, 'seeking_description'),
+        'genres': _genres(row),
+    }
+
+
+def show_values(row):
+    start_time = _text(row, 'start_time', required=True)
+    try:
+        start_time = local_time(dateutil.parser.parse(start_time))
+    except (ValueError, OverflowError):
+        raise RowError(f'invalid start_time {start_time!r}')
+
+    end_time = _text(row, 'end_time')
+    if end_time is not None:
+        try:
+            end_time = local_time(dateutil.parser.parse(end_time))
+        except (ValueError, OverflowError):
+            raise RowError(f'invalid end_time {end_time!r}')
+    try:
+        Show(start_time=start_time, end_time=end_time).validate_times()
+    except ValueError as e:
+        raise RowError(str(e))
+
+    return {
+        'start_time': start_time,
+        'end_time': end_time or start_time + SHOW_DEFAULT_DURATION,
+        'artist': _reference(row, 'artist'),
+        'venue': _reference(row, 'venue'),
+    }
+
+
+def resolve_references(model, refs):
+    """Map each id or name in `refs` to an existing id, in two queries.
+
+    Names shared by several records are ambiguous and map to None.
+    """
+    ids = {ref for ref in refs if isinstance(ref, int)}
+    names = {ref for ref in refs if isinstance(ref, str)}
+
+    resolved = {}
+    if ids:
+        for (record_id,) in db.session.query(model.id).filter(
+            model.id.in_(ids)
+        ):
+            resolved[record_id] = record_id
+    if names:
+        for record_id, name in db.session.query(model.id, model.name).filter(
+            model.name.in_(names)
+        ):
+            resolved[name] = None if name in resolved else record_id
+    return resolved
+
+
+def _insert_entities(model, values):
+    db.session.add_all(model(**v) for v in values)
+    db.session.commit()
+
+
+def _insert_shows(values):
+    artists = resolve_references(Artist, {v['artist'] for _, v in values})
+    venues = resolve_references(Venue, {v['venue'] for _, v in values})
+
+    rows, errors = [], []
+    for line_num, v in values:
+        artist_id = artists.get(v['artist'])
+        venue_id = venues.get(v['venue'])
+        if artist_id is None:
+            errors.append((line_num, f"unknown or ambiguous artist {v['artist']!r}"))
+        elif venue_id is None:
+            errors.append((line_num, f"unknown or ambiguous venue {v['venue']!r}"))
+        else:
+            rows.append((line_num, {
+                'start_time': v['start_time'],
+                'end_time': v['end_time'],
+                'artist_id': artist_id,
+                'venue_id': venue_id,
+            }))
+
+    # Double bookings would break the exclusion constraints on PostgreSQL
+    # and the whole chunk with them; the first of overlapping rows is kept.
+    conflicts = Show.conflicts(Show(**row) for _, row in rows)
+    rejected = set()
+    for i, (line_num, _) in enumerate(rows):
+        conflict = conflicts.get(i)
+        if conflict is None:
+            continue
+        if conflict['shows']:
+            booked = ', '.join(f'#{show.id}' for show in conflict['shows'])
+            errors.append((line_num, f'overlaps show {booked}'))
+            rejected.add(i)
+            continue
+        earlier = [j for j in conflict['bookings'] if j < i and j not in rejected]
+        if earlier:
+            errors.append((line_num, f'overlaps line {rows[earlier[0]][0]}'))
+            rejected.add(i)
+    rows = [row for i, (_, row) in enumerate(rows) if i not in rejected]
+
+    venue_ids = {row['venue_id'] for row in rows}
+    artist_ids = {row['artist_id'] for row in rows}
+    if rows:
+        # A single executemany for the whole chunk.
+        db.session.execute(Show.__table__.insert(), rows)
+        refresh_show_counts(venue_ids, artist_ids)
+    db.session.commit()
+    response_cache.invalidate(
+        *[f'venue:{venue_id}' for venue_id in venue_ids],
+        *[f'artist:{artist_id}' for artist_id in artist_ids]
+    )
+    return len(rows), errors
+
+
+IMPORTERS = {
+    'venues': (venue_values, Venue),
+    'artists': (artist_values, Artist),
+    'shows': (show_values, Show),
+}
+
+
+def import_rows(kind, rows, chunk_size=1000, progress=None):
+    """Validate and insert `rows` of `kind`, one transaction per chunk.
+
+    `progress(imported, errors, elapsed)` is called after every chunk.
+    The listing pages are invalidated at the end, even when a chunk fails
+    after others were committed. Returns (imported count, [(line number,
+    message)]).
+    """
+    try:
+        return _import_chunks(kind, rows, chunk_size, progress)
+    finally:
+        response_cache.invalidate('venues', 'artists', 'shows')
+
+
+def _import_chunks(kind, rows, chunk_size, progress):
+    parse, model = IMPORTERS[kind]
+    imported, errors = 0, []
+    started = time.monotonic()
+
+    for chunk in chunked(rows, chunk_size):
+        values = []
+        for line_num, row in chunk:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                values.append((line_num, parse(row)))
+            except RowError as e:
+                errors.append((line_num, str(e)))
+
+        try:
+            if model is Show:
+                count, chunk_errors = _insert_shows(values)
+                errors.extend(chunk_errors)
+            else:
+                _insert_entities(model, [v for _, v in values])
+                count = len(values)
+        except Exception:
+            db.session.rollback()
+            raise
+
+        imported += count
+        if progress is not None:
+            progress(imported, len(errors), time.monotonic() - started)
+
+    return imported, sorted(errors)
@@ -0,0 +1,59 @@
+"""add precomputed past/upcoming show counters to venue and artist
+
+Revision ID: 3e8b1d4a9c27
+Revises: 7c2e90b4f1d5
+Create Date: 2026-10-18 17:02:11.408213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8b1d4a9c27'
+down_revision = '7c2e90b4f1d5'
+branch_labels = None
+depends_on = None
+
+
+COUNTERS = [('Venue', 'venue_id'), ('Artist', 'artist_id')]
+
+
+def upgrade():
+    op.add_column('Show', sa.Column(
+        'is_upcoming', sa.Boolean(), nullable=False,
+        server_default=sa.false()
+    ))
+    op.alter_column('Show', 'is_upcoming', server_default=None)
+    op.execute('UPDATE "Show" SET is_upcoming = start_time > now()')
+    op.create_index(
+        'ix_Show_upcoming_start_time', 'Show', ['start_time'], unique=False,
+        postgresql_where=sa.text('is_upcoming')
+    )
+
+    for table, foreign_key in COUNTERS:
+        for column in ['upcoming_shows_count', 'past_shows_count']:
+            op.add_column(table, sa.Column(
+                column, sa.Integer(), nullable=False, server_default='0'
+            ))
+        op.execute(f'''
+            UPDATE "{table}" SET
+                upcoming_shows_count = (
+                    SELECT count(*) FROM "Show"
+                    WHERE "Show".{foreign_key} = "{table}".id
+                    AND "Show".is_upcoming
+                ),
+                past_shows_count = (
+                    SELECT count(*) FROM "Show"
+                    WHERE "Show".{foreign_key} = "{table}".id
+                    AND NOT "Show".is_upcoming
+                )
+        ''')
+
+
+def downgrade():
+    for table, _ in reversed(COUNTERS):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_index('ix_Show_upcoming_start_time', table_name='Show')
+    op.drop_column('Show', 'is_upcoming')
@@ -0,0 +1,50 @@
+"""cascade venue and artist deletes in the database, add archived_at
+
+Revision ID: 5d0f3b2a8e61
+Revises: 3e8b1d4a9c27
+Create Date: 2026-10-18 17:48:36.120954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0f3b2a8e61'
+down_revision = '3e8b1d4a9c27'
+branch_labels = None
+depends_on = None
+
+
+FOREIGN_KEYS = [
+    ('Show', 'venue_id', 'Venue'),
+    ('Show', 'artist_id', 'Artist'),
+    ('VenueGenre', 'venue_id', 'Venue'),
+    ('ArtistGenre', 'artist_id', 'Artist'),
+]
+
+
+def _replace_foreign_keys(ondelete):
+    for table, column, referred in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(
+            name, table, referred, [column], ['id'], ondelete=ondelete
+        )
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+    for table in ['Venue', 'Artist']:
+        op.add_column(table, sa.Column('archived_at', sa.DateTime()))
+        op.create_index(
+            f'ix_{table}_archived_at', table, ['archived_at'], unique=False,
+            postgresql_where=sa.text('archived_at IS NOT NULL')
+        )
+
+
+def downgrade():
+    for table in ['Artist', 'Venue']:
+        op.drop_index(f'ix_{table}_archived_at', table_name=table)
+        op.drop_column(table, 'archived_at')
+    _replace_foreign_keys(None)
@@ -0,0 +1,44 @@
+"""add show end times, exclude overlapping bookings
+
+Revision ID: 8f4c2d7b1e93
+Revises: 5d0f3b2a8e61
+Create Date: 2026-10-18 18:20:47.532019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f4c2d7b1e93'
+down_revision = '5d0f3b2a8e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute(
+        'UPDATE "Show" SET end_time = start_time + interval \'2 hours\''
+    )
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.create_check_constraint(
+        'ck_Show_end_after_start', 'Show', 'end_time > start_time'
+    )
+
+    # Fails while existing shows overlap; Show.conflicts(Show.query) in
+    # `flask shell` lists them.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for column in ['venue_id', 'artist_id']:
+        op.execute(
+            f'ALTER TABLE "Show" ADD CONSTRAINT "Show_{column}_overlap_excl" '
+            f'EXCLUDE USING gist ({column} WITH =, '
+            f'tsrange(start_time, end_time) WITH &&)'
+        )
+
+
+def downgrade():
+    for column in ['artist_id', 'venue_id']:
+        op.drop_constraint(f'Show_{column}_overlap_excl', 'Show')
+    op.drop_constraint('ck_Show_end_after_start', 'Show', type_='check')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,102 @@
+"""move venue and artist genres into indexed association tables
+
+Revision ID: 9a31f6c0d8e2
+Revises: 4b7d2e91c3a0
+Create Date: 2026-10-18 11:02:47.905114
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a31f6c0d8e2'
+down_revision = '4b7d2e91c3a0'
+branch_labels = None
+depends_on = None
+
+
+def _decode_genres(value):
+    try:
+        genres = json.loads(value) if value else []
+    except ValueError:
+        return []
+    if not isinstance(genres, list):
+        return []
+    return list(dict.fromkeys(g for g in genres if isinstance(g, str)))
+
+
+def _move_to_table(conn, owner, link, fk):
+    owner_table = sa.table(
+        owner, sa.column('id', sa.Integer), sa.column('genres', sa.String)
+    )
+    link_table = sa.table(
+        link, sa.column('genre', sa.String), sa.column(fk, sa.Integer)
+    )
+    rows = [
+        {'genre': genre, fk: row.id}
+        for row in conn.execute(sa.select([owner_table.c.id, owner_table.c.genres]))
+        for genre in _decode_genres(row.genres)
+    ]
+    if rows:
+        op.bulk_insert(link_table, rows)
+
+
+def _move_to_column(conn, owner, link, fk):
+    owner_table = sa.table(
+        owner, sa.column('id', sa.Integer), sa.column('genres', sa.String)
+    )
+    link_table = sa.table(
+        link, sa.column('genre', sa.String), sa.column(fk, sa.Integer)
+    )
+    genres = {}
+    for row in conn.execute(
+        sa.select([link_table.c[fk], link_table.c.genre])
+    ):
+        genres.setdefault(row[0], []).append(row[1])
+    for owner_id, values in genres.items():
+        conn.execute(
+            owner_table.update().where(
+                owner_table.c.id == owner_id
+            ).values(genres=json.dumps(values))
+        )
+
+
+def upgrade():
+    op.create_table('VenueGenre',
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('genre', 'venue_id')
+    )
+    op.create_index(op.f('ix_VenueGenre_venue_id'), 'VenueGenre', ['venue_id'], unique=False)
+    op.create_table('ArtistGenre',
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+    sa.PrimaryKeyConstraint('genre', 'artist_id')
+    )
+    op.create_index(op.f('ix_ArtistGenre_artist_id'), 'ArtistGenre', ['artist_id'], unique=False)
+
+    conn = op.get_bind()
+    _move_to_table(conn, 'Venue', 'VenueGenre', 'venue_id')
+    _move_to_table(conn, 'Artist', 'ArtistGenre', 'artist_id')
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.VARCHAR(), autoincrement=False, nullable=True))
+
+    conn = op.get_bind()
+    _move_to_column(conn, 'Venue', 'VenueGenre', 'venue_id')
+    _move_to_column(conn, 'Artist', 'ArtistGenre', 'artist_id')
+
+    op.drop_index(op.f('ix_ArtistGenre_artist_id'), table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index(op.f('ix_VenueGenre_venue_id'), table_name='VenueGenre')
+    op.drop_table('VenueGenre')
@@ -1,19 +1,425 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_moment import Moment
 import datetime
-import json
+from contextlib import contextmanager
+
+from sqlalchemy import DDL, MetaData, Table, event
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from cache import response_cache
+from database import SQLAlchemy
+from profiling import measure
 
 
 db = SQLAlchemy()
 
+# Shows saved without an end time last SHOW_DEFAULT_DURATION. None lasts
+# more than SHOW_MAX_DURATION, which bounds how long before a booking an
+# overlapping show can start.
+SHOW_DEFAULT_DURATION = datetime.timedelta(hours=2)
+SHOW_MAX_DURATION = datetime.timedelta(hours=24)
+
+
+@measure('serialize')
+def split_past_upcoming(shows, now=None, serializer=None):
+    """Serialized (past, upcoming) shows, split against a single `now`."""
+    if now is None:
+        now = datetime.datetime.now()
+    if serializer is None:
+        serializer = lambda show: show.serialize_with_artist_venue
+
+    past_shows, upcoming_shows = [], []
+    for show in shows:
+        if show.start_time > now:
+            upcoming_shows.append(serializer(show))
+        elif show.start_time < now:
+            past_shows.append(serializer(show))
+    return past_shows, upcoming_shows
+
+
+def detail_query(cls, entity_id, counterpart):
+    other = getattr(Show, counterpart)
+    return db.session.query(cls).outerjoin(
+        cls.shows
+    ).outerjoin(other).options(
+        db.contains_eager(cls.shows).contains_eager(other)
+    ).filter(cls.id == entity_id).order_by(Show.start_time)
+
+
+@measure('serialize')
+def serialize_detail(entity, counterpart, past_shows, upcoming_shows):
+    """Detail page data of `entity` given its past and upcoming shows."""
+    def serialize_show(show):
+        related = getattr(show, counterpart)
+        return {
+            f'{counterpart}_id': related.id,
+            f'{counterpart}_name': related.name,
+            f'{counterpart}_image_link': related.image_link,
+            'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    return dict(
+        entity.serialize,
+        past_shows=[serialize_show(show) for show in past_shows],
+        upcoming_shows=[serialize_show(show) for show in upcoming_shows],
+        past_shows_count=len(past_shows),
+        upcoming_shows_count=len(upcoming_shows)
+    )
+
+
+def load_with_shows(cls, entity_id, counterpart):
+    """Detail page data for a venue or artist, or None if it doesn't exist.
+
+    The entity, its shows and each show's `counterpart` ('artist' for a
+    venue, 'venue' for an artist) are fetched in one statement, and the
+    shows are split into past and upcoming against a single `now`.
+    """
+    entity = detail_query(cls, entity_id, counterpart).one_or_none()
+
+    if entity is None:
+        return None
+
+    past_shows, upcoming_shows = split_past_upcoming(
+        entity.shows, serializer=lambda show: show
+    )
+    return serialize_detail(entity, counterpart, past_shows, upcoming_shows)
+
+
+def refresh_show_counts(venue_ids=(), artist_ids=()):
+    """Recount the show counters of the given venues and artists.
+
+    Counts come from the `is_upcoming` flag of their shows, with one UPDATE
+    per table; the caller commits. Shows of archived venues and artists
+    aren't counted, as they are hidden everywhere else. Counters aren't edits, so `updated_at`,
+    which exports, ETags and fragment versions go by, is left alone.
+    """
+    for model, column, ids in [
+        (Venue, Show.venue_id, venue_ids),
+        (Artist, Show.artist_id, artist_ids),
+    ]:
+        if not ids:
+            continue
+
+        def count(upcoming):
+            # In an UPDATE, where the archived criteria don't apply.
+            return db.session.query(db.func.count(Show.id)).filter(
+                column == model.id, Show.is_upcoming == upcoming,
+                _unarchived_shows()
+            ).correlate(model).scalar_subquery()
+
+        db.session.query(model).filter(model.id.in_(set(ids))).update({
+            model.upcoming_shows_count: count(True),
+            model.past_shows_count: count(False),
+            model.updated_at: model.updated_at,
+        }, synchronize_session=False)
+
+
+class UnitOfWork:
+    """Changes gathered by `unit_of_work()` until its single commit."""
+
+    def __init__(self):
+        self.saved = []
+        self.cache_tags = set()
+        self.venue_ids = set()
+        self.artist_ids = set()
+
+    def save(self, entity):
+        db.session.add(entity)
+        self.saved.append(entity)
+
+    def delete(self, entity):
+        # Deleted entities can't tell their tags after the flush.
+        self.invalidate(*entity.cache_tags)
+        db.session.delete(entity)
+
+    def invalidate(self, *tags):
+        self.cache_tags.update(tags)
+
+    def recount(self, venue_ids=(), artist_ids=()):
+        self.venue_ids.update(venue_ids)
+        self.artist_ids.update(artist_ids)
+
+    def commit(self):
+        db.session.flush()
+        # Saved entities have their ids now; venues and artists are tagged
+        # with one query per model.
+        saved = [
+            entity for entity in self.saved if not db.inspect(entity).deleted
+        ]
+        for model in (Venue, Artist):
+            ids = [entity.id for entity in saved if type(entity) is model]
+            if ids:
+                self.invalidate(*model.cache_tags_of(ids))
+        for entity in saved:
+            if not isinstance(entity, (Venue, Artist)):
+                self.invalidate(*entity.cache_tags)
+        refresh_show_counts(self.venue_ids, self.artist_ids)
+        db.session.commit()
+
+
+@contextmanager
+def unit_of_work():
+    """Group saves, updates and deletes into one flush and commit.
+
+    Inside the block, save(), update() and delete() only stage their
+    changes; show counters are recounted once, the transaction is
+    committed and the response cache invalidated when the outermost block
+    exits, or everything is rolled back if it raises. Nested blocks join
+    the outer one. Also usable as a decorator, deferring the commit of a
+    request handler until it returns.
+    """
+    work = db.session.info.get('unit_of_work')
+    if work is not None:
+        yield work
+        return
+
+    work = db.session.info['unit_of_work'] = UnitOfWork()
+    try:
+        yield work
+        work.commit()
+    except BaseException:
+        db.session.rollback()
+        raise
+    finally:
+        del db.session.info['unit_of_work']
+    response_cache.invalidate(*work.cache_tags)
+
+
+def save_all(entities):
+    """Save venues, artists and shows in one transaction."""
+    with unit_of_work():
+        for entity in entities:
+            entity.save()
+
+
+def delete_all(entities):
+    """Delete venues, artists and shows in one transaction."""
+    with unit_of_work():
+        for entity in entities:
+            entity.delete()
+
+
+def _foreign_keys(model):
+    """Foreign keys to Venue or Artist `model`: Show's, Show's to the other
+    side, and the genre links'."""
+    if model is Venue:
+        return Show.venue_id, Show.artist_id, VenueGenre.venue_id
+    return Show.artist_id, Show.venue_id, ArtistGenre.artist_id
+
+
+def _shows_of(model, ids):
+    column = _foreign_keys(model)[0]
+    return db.session.query(Show.venue_id, Show.artist_id).filter(
+        column.in_(ids)
+    ).execution_options(include_archived=True)
+
+
+def _counterpart_ids(model, ids):
+    """Ids of the artists (or venues) with shows at venues (or of artists)
+    `ids`, without loading the shows."""
+    column, counterpart, _ = _foreign_keys(model)
+    return [
+        counterpart_id for (counterpart_id,) in
+        db.session.query(counterpart).filter(column.in_(ids)).distinct()
+    ]
+
+
+def _forget_shows(rows, work):
+    """Have `work` recount and invalidate what renders the shows `rows`,
+    given as (venue_id, artist_id)."""
+    venue_ids = {venue_id for venue_id, _ in rows}
+    artist_ids = {artist_id for _, artist_id in rows}
+    work.recount(venue_ids, artist_ids)
+    work.invalidate(
+        'venues', 'artists', 'shows',
+        *[f'venue:{venue_id}' for venue_id in venue_ids],
+        *[f'artist:{artist_id}' for artist_id in artist_ids]
+    )
+
+
+def delete_with_shows(model, ids):
+    """Delete venues or artists along with their shows and genres.
+
+    One set-based DELETE per table, so nothing is loaded however many
+    shows there are. Returns the number of venues or artists deleted.
+    """
+    ids = list(ids)
+    column, _, genre_column = _foreign_keys(model)
+    with unit_of_work() as work:
+        _forget_shows(_shows_of(model, ids).distinct().all(), work)
+        work.invalidate(*[f'{column.key[:-3]}:{entity_id}' for entity_id in ids])
+        for target, criterion in [
+            (Show, column.in_(ids)),
+            (genre_column.class_, genre_column.in_(ids)),
+            (model, model.id.in_(ids)),
+        ]:
+            deleted = db.session.query(target).filter(criterion).delete(
+                synchronize_session='evaluate'
+            )
+    return deleted
+
+
+def archive(model, ids):
+    """Hide venues or artists, and their shows, from every query at once;
+    purge_archived() deletes them later.
+
+    The other side's counters are recounted without their shows. Returns
+    the number of venues or artists archived.
+    """
+    ids = list(ids)
+    column = _foreign_keys(model)[0]
+    with unit_of_work() as work:
+        _forget_shows(_shows_of(model, ids).distinct().all(), work)
+        work.invalidate(*[f'{column.key[:-3]}:{entity_id}' for entity_id in ids])
+        return model.query.filter(model.id.in_(ids)).update(
+            {model.archived_at: datetime.datetime.utcnow()},
+            synchronize_session='evaluate'
+        )
+
+
+def purge_archived(batch_size=1000, before=None):
+    """Delete archived venues and artists for good, with their shows.
+
+    Meant to run periodically. Shows go first, then the venues and
+    artists, at most `batch_size` rows per transaction so none holds many
+    locks for long. With `before`, only what was archived earlier is
+    purged. Returns {table: venues or artists purged}.
+    """
+    purged = {}
+    for model in (Venue, Artist):
+        archived = db.session.query(model.id).filter(
+            model.archived_at.isnot(None)
+        )
+        if before is not None:
+            archived = archived.filter(model.archived_at < before)
+        archived = archived.order_by(model.id).limit(batch_size) \
+            .execution_options(include_archived=True)
+
+        purged[model.__tablename__] = 0
+        while True:
+            ids = [entity_id for (entity_id,) in archived]
+            if not ids:
+                break
+
+            shows = _shows_of(model, ids).add_columns(Show.id).limit(batch_size)
+            while True:
+                rows = shows.all()
+                if not rows:
+                    break
+                with unit_of_work() as work:
+                    _forget_shows([row[:2] for row in rows], work)
+                    db.session.query(Show).filter(
+                        Show.id.in_([row.id for row in rows])
+                    ).delete(synchronize_session=False)
+
+            purged[model.__tablename__] += delete_with_shows(model, ids)
+    return purged
+
+
+def _unarchived_shows():
+    """Criterion on Show leaving out the shows of archived venues and
+    artists."""
+    # Selected from the tables rather than the models, which the archived
+    # criteria would apply to again.
+    venues, artists = Venue.__table__, Artist.__table__
+    return Show.venue_id.notin_(
+        db.select(venues.c.id).where(venues.c.archived_at.isnot(None))
+    ) & Show.artist_id.notin_(
+        db.select(artists.c.id).where(artists.c.archived_at.isnot(None))
+    )
+
+
+def archived_criteria():
+    """Options leaving archived venues and artists, and their shows, out of
+    an ORM select."""
+    return (
+        with_loader_criteria(
+            Venue, Venue.archived_at.is_(None), include_aliases=True
+        ),
+        with_loader_criteria(
+            Artist, Artist.archived_at.is_(None), include_aliases=True
+        ),
+        with_loader_criteria(
+            Show, _unarchived_shows(), include_aliases=True
+        ),
+    )
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_archived(state):
+    """Apply `archived_criteria` to ORM queries, unless run with the
+    `include_archived` execution option."""
+    if not state.is_select or state.is_column_load \
+            or state.is_relationship_load \
+            or state.execution_options.get('include_archived'):
+        return
+    state.statement = state.statement.options(*archived_criteria())
+
+
+def _is_upcoming(context):
+    start_time = context.get_current_parameters()['start_time']
+    return start_time is not None and start_time > datetime.datetime.now()
+
+
+def _end_time(show):
+    if show.end_time is not None:
+        return show.end_time
+    return show.start_time + SHOW_DEFAULT_DURATION
+
+
+def _default_end_time(context):
+    start_time = context.get_current_parameters()['start_time']
+    return start_time and start_time + SHOW_DEFAULT_DURATION
+
+
+def _overlaps_within(bookings):
+    """(i, j) pairs of `bookings` sharing a venue or an artist at
+    overlapping times, found by sweeping each one's bookings by start."""
+    pairs = []
+    for attribute in ('venue_id', 'artist_id'):
+        intervals = {}
+        for i, booking in enumerate(bookings):
+            intervals.setdefault(int(getattr(booking, attribute)), []).append(
+                (booking.start_time, _end_time(booking), i)
+            )
+        for sweep in intervals.values():
+            sweep.sort()
+            running = []
+            for start, end, i in sweep:
+                running = [(until, j) for until, j in running if until > start]
+                pairs.extend((j, i) for _, j in running)
+                running.append((end, i))
+    return pairs
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index(
+            'ix_Venue_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+        db.Index('ix_Venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        # Only archived venues, which every query excludes.
+        db.Index(
+            'ix_Venue_archived_at', 'archived_at',
+            postgresql_where=db.text('archived_at IS NOT NULL'),
+            sqlite_where=db.text('archived_at IS NOT NULL')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.String)
+    genre_links = db.relationship(
+        'VenueGenre', lazy='selectin', cascade='all, delete-orphan',
+        passive_deletes=True
+    )
+    genres = association_proxy(
+        'genre_links', 'genre', creator=lambda genre: VenueGenre(genre=genre)
+    )
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -23,28 +429,72 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     website = db.Column(db.String(120))
+    updated_at = db.Column(
+        db.DateTime, nullable=False, index=True,
+        default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
+    # Set by archive(); archived rows are hidden until purge_archived().
+    archived_at = db.Column(db.DateTime)
+    # Maintained by Show.save()/delete() and Show.roll_over().
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
 
     def save(self):
-        db.session.add(self)
-        db.session.commit()
+        # Touched explicitly so that genre-only edits also count as changes.
+        self.updated_at = datetime.datetime.utcnow()
+        with unit_of_work() as work:
+            work.save(self)
 
-    def update(self):
-        db.session.update(self)
-        db.session.commit()
+    def update(self, **values):
+        """Set the given attributes and save the venue."""
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.save()
 
     def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+        delete_with_shows(Venue, [self.id])
+
+    def archive(self):
+        archive(Venue, [self.id])
 
     def __repr__(self):
         return f'<Venue {self.id}>'
 
+    @classmethod
+    def with_genre(cls, genre):
+        """Venues listed under `genre`, looked up through the VenueGenre key."""
+        return cls.query.join(cls.genre_links).filter(
+            VenueGenre.genre == genre
+        )
+
     @property
+    def cache_tags(self):
+        """Cached pages that render this venue."""
+        return self.cache_tags_of([self.id])
+
+    @classmethod
+    def cache_tags_of(cls, ids):
+        """Cached pages that render the venues `ids`."""
+        return ['venues', 'shows', *[f'venue:{i}' for i in ids]] + [
+            f'artist:{artist_id}' for artist_id in _counterpart_ids(cls, ids)
+        ]
+
+    @property
+    def fragment_version(self):
+        """Stamp of the venue's cached tiles, changed by every save()."""
+        return f'{self.updated_at:%Y%m%d%H%M%S%f}'
+
+    @property
+    @measure('serialize')
     def serialize(self):
         return {
             'id': self.id,
             'name': self.name,
-            'genres': json.loads(self.genres),
+            'genres': list(self.genres),
             'city': self.city,
             'state': self.state,
             'address': self.address,
@@ -56,8 +506,8 @@ class Venue(db.Model):
             'facebook_link': self.facebook_link
         }
 
-    @property
-    def serialize_with_upcoming_shows_count(self):
+    @measure('serialize')
+    def serialize_with_num_shows(self, num_shows):
         return {
             'id': self.id,
             'name': self.name,
@@ -70,75 +520,77 @@ class Venue(db.Model):
             'website': self.website,
             'seeking_description': self.seeking_description,
             'seeking_talent': self.seeking_talent,
-            'num_shows': Show.query.filter(
-                Show.start_time > datetime.datetime.now(),
-                Show.venue_id == self.id
-            )
+            'num_shows': num_shows,
+            'version': self.fragment_version
         }
 
-    @property
-    def serialize_with_shows_details(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'state': self.state,
-            'city': self.city,
-            'address': self.address,
-            'phone': self.phone,
-            'facebook_link': self.facebook_link,
-            'image_link': self.image_link,
-            'seeking_description': self.seeking_description,
-            'seeking_talent': self.seeking_talent,
-            'genres': json.loads(self.genres),
-            'website': self.website,
-            'upcoming_shows': [
-                show.serialize_with_artist_venue for show in Show.query.filter(
-                    Show.start_time > datetime.datetime.now(),
-                    Show.venue_id == self.id
-                ).all()
-            ],
-            'past_shows': [
-                show.serialize_with_artist_venue for show in Show.query.filter(
-                    Show.start_time < datetime.datetime.now(),
-                    Show.venue_id == self.id
-                ).all()
-            ],
-            'upcoming_shows_count': len(
-                Show.query.filter(
-                    Show.start_time > datetime.datetime.now(),
-                    Show.venue_id == self.id
-                ).all()
-            ),
-            'past_shows_count': len(
-                Show.query.filter(
-                    Show.start_time < datetime.datetime.now(),
-                    Show.venue_id == self.id
-                ).all()
-            )
-        }
+    @classmethod
+    def load_details(cls, venue_id):
+        return load_with_shows(cls, venue_id, 'artist')
 
-    @property
-    def filter_on_city_state(self):
-        return {
-            'city': self.city,
-            'state': self.state,
-            'venues': [
-                v.serialize_with_upcoming_shows_count
-                for v in Venue.query.filter(
-                    Venue.city == self.city, Venue.state == self.state
-                ).all()
-            ]
-        }
+    @classmethod
+    def query_with_num_shows(cls):
+        """Query of (venue, upcoming shows count) rows.
+
+        The count is read from the precomputed `upcoming_shows_count`.
+        """
+        return db.session.query(cls, cls.upcoming_shows_count)
+
+    @classmethod
+    def group_by_city_state(cls, rows=None):
+        """Venues grouped by area, each with its upcoming shows count.
+
+        `rows` are (venue, num_shows) pairs from `query_with_num_shows`,
+        ordered so that venues of the same area are adjacent; they are
+        grouped in a single pass. Every venue is fetched when omitted.
+        """
+        if rows is None:
+            rows = cls.query_with_num_shows().order_by(
+                cls.state, cls.city, cls.name, cls.id
+            ).all()
+
+        areas = []
+        for venue, num_shows in rows:
+            if not areas or areas[-1]['city'] != venue.city \
+                    or areas[-1]['state'] != venue.state:
+                areas.append({
+                    'city': venue.city,
+                    'state': venue.state,
+                    'venues': []
+                })
+            areas[-1]['venues'].append(
+                venue.serialize_with_num_shows(int(num_shows))
+            )
+        return areas
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index(
+            'ix_Artist_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index(
+            'ix_Artist_archived_at', 'archived_at',
+            postgresql_where=db.text('archived_at IS NOT NULL'),
+            sqlite_where=db.text('archived_at IS NOT NULL')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genre_links = db.relationship(
+        'ArtistGenre', lazy='selectin', cascade='all, delete-orphan',
+        passive_deletes=True
+    )
+    genres = association_proxy(
+        'genre_links', 'genre', creator=lambda genre: ArtistGenre(genre=genre)
+    )
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
@@ -146,64 +598,67 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean)
     facebook_link = db.Column(db.String(120))
     seeking_description = db.Column(db.String(500))
-
+    updated_at = db.Column(
+        db.DateTime, nullable=False, index=True,
+        default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
+    # Set by archive(); archived rows are hidden until purge_archived().
+    archived_at = db.Column(db.DateTime)
+    # Maintained by Show.save()/delete() and Show.roll_over().
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
 
     def save(self):
-        db.session.add(self)
-        db.session.commit()
+        # Touched explicitly so that genre-only edits also count as changes.
+        self.updated_at = datetime.datetime.utcnow()
+        with unit_of_work() as work:
+            work.save(self)
 
-    def update(self):
-        db.session.update(self)
-        db.session.commit()
+    def update(self, **values):
+        """Set the given attributes and save the artist."""
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.save()
 
     def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+        delete_with_shows(Artist, [self.id])
+
+    def archive(self):
+        archive(Artist, [self.id])
 
     def __repr__(self):
         return f'<Artist {self.id}>'
 
+    @classmethod
+    def with_genre(cls, genre):
+        """Artists listed under `genre`, looked up through the ArtistGenre key."""
+        return cls.query.join(cls.genre_links).filter(
+            ArtistGenre.genre == genre
+        )
+
     @property
-    def serialize_with_shows_details(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'city': self.city,
-            'state': self.state,
-            'genres': json.loads(self.genres),
-            'phone': self.phone,
-            'facebook_link': self.facebook_link,
-            'image_link': self.image_link,
-            'seeking_venue': self.seeking_venue,
-            'seeking_description': self.seeking_description,
-            'website': self.website,
-            'upcoming_shows': [
-                show.serialize_with_artist_venue for show in Show.query.filter(
-                    Show.start_time > datetime.datetime.now(),
-                    Show.artist_id == self.id
-                ).all()
-            ],
-            'past_shows': [
-                show.serialize_with_artist_venue for show in Show.query.filter(
-                    Show.start_time < datetime.datetime.now(),
-                    Show.artist_id == self.id
-                ).all()
-            ],
-            'upcoming_shows_count': len(
-                Show.query.filter(
-                    Show.start_time > datetime.datetime.now(),
-                    Show.artist_id == self.id
-                ).all()
-            ),
-            'past_shows_count': len(
-                Show.query.filter(
-                    Show.start_time < datetime.datetime.now(),
-                    Show.artist_id == self.id
-                ).all()
-            )
-        }
+    def cache_tags(self):
+        """Cached pages that render this artist."""
+        return self.cache_tags_of([self.id])
+
+    @classmethod
+    def cache_tags_of(cls, ids):
+        """Cached pages that render the artists `ids`."""
+        return ['artists', 'shows', *[f'artist:{i}' for i in ids]] + [
+            f'venue:{venue_id}' for venue_id in _counterpart_ids(cls, ids)
+        ]
+
+    @property
+    def fragment_version(self):
+        """Stamp of the artist's cached tiles, changed by every save()."""
+        return f'{self.updated_at:%Y%m%d%H%M%S%f}'
 
     @property
+    @measure('serialize')
     def serialize(self):
         return {
             'id': self.id,
@@ -212,62 +667,379 @@ class Artist(db.Model):
             'state': self.state,
             'phone': self.phone,
             'image_link': self.image_link,
-            'genres': json.loads(self.genres),
+            'genres': list(self.genres),
             'seeking_venue': self.seeking_venue,
+            'seeking_description': self.seeking_description,
+            'website': self.website,
             'facebook_link': self.facebook_link,
         }
 
+    @property
+    def serialize_with_show_counts(self):
+        return dict(
+            self.serialize,
+            upcoming_shows_count=self.upcoming_shows_count,
+            past_shows_count=self.past_shows_count,
+            version=self.fragment_version
+        )
+
+    @classmethod
+    def load_details(cls, artist_id):
+        return load_with_shows(cls, artist_id, 'venue')
+
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # Only shows still to be rolled over into the past counters.
+        db.Index(
+            'ix_Show_upcoming_start_time', 'start_time',
+            postgresql_where=db.text('is_upcoming'),
+            sqlite_where=db.text('is_upcoming')
+        ),
+        db.CheckConstraint(
+            'end_time > start_time', name='ck_Show_end_after_start'
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime())
+    end_time = db.Column(
+        db.DateTime(), nullable=False, default=_default_end_time
+    )
     venue_id = db.Column(
-        db.Integer, db.ForeignKey('Venue.id'),
+        db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'),
         nullable=False
     )
     venue = db.relationship(
-        'Venue', backref=db.backref('shows', cascade='all, delete')
+        'Venue', backref=db.backref(
+            'shows', cascade='all, delete', passive_deletes=True
+        )
     )
     artist_id = db.Column(
         db.Integer,
-        db.ForeignKey('Artist.id'),
+        db.ForeignKey('Artist.id', ondelete='CASCADE'),
         nullable=False
     )
     artist = db.relationship(
-        'Artist', backref=db.backref('shows', cascade='all, delete')
+        'Artist', backref=db.backref(
+            'shows', cascade='all, delete', passive_deletes=True
+        )
+    )
+    updated_at = db.Column(
+        db.DateTime, nullable=False, index=True,
+        default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
     )
+    # Whether the show is counted in its venue's and artist's upcoming
+    # counters rather than their past ones.
+    is_upcoming = db.Column(db.Boolean, nullable=False, default=_is_upcoming)
 
     def save(self):
-        db.session.add(self)
-        db.session.commit()
+        self.validate_times()
+        self.updated_at = datetime.datetime.utcnow()
+        self.is_upcoming = self.start_time > datetime.datetime.now()
+        # Recount wherever the show was and is now, and drop the pages of
+        # a venue or artist it moved away from: cache_tags only knows the
+        # new ones after the flush.
+        state = db.inspect(self)
+        old_venue_ids = set(state.attrs.venue_id.history.deleted) - {None}
+        old_artist_ids = set(state.attrs.artist_id.history.deleted) - {None}
+        with unit_of_work() as work:
+            work.recount(
+                {self.venue_id, *old_venue_ids},
+                {self.artist_id, *old_artist_ids}
+            )
+            work.invalidate(
+                *[f'venue:{venue_id}' for venue_id in old_venue_ids],
+                *[f'artist:{artist_id}' for artist_id in old_artist_ids]
+            )
+            work.save(self)
 
-    def update(self):
-        db.session.update(self)
-        db.session.commit()
+    def update(self, **values):
+        """Set the given attributes and save the show."""
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.save()
 
     def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+        with unit_of_work() as work:
+            work.recount({self.venue_id}, {self.artist_id})
+            work.delete(self)
 
     def __repr__(self):
         return f'<Show {self.id}>'
 
+    def validate_times(self):
+        """Raise ValueError unless the show ends after it starts, within
+        SHOW_MAX_DURATION."""
+        if self.start_time is None:
+            raise ValueError('A show needs a start time.')
+        duration = _end_time(self) - self.start_time
+        if not datetime.timedelta(0) < duration <= SHOW_MAX_DURATION:
+            hours = SHOW_MAX_DURATION / datetime.timedelta(hours=1)
+            raise ValueError(
+                f'A show must end after it starts, within {hours:g} hours.'
+            )
+
+    @classmethod
+    def conflicts_query(cls):
+        """Query of (booking index, show) for the shows overlapping the
+        `proposed_bookings` at the same venue or with the same artist.
+
+        The bookings are joined to the shows through
+        ix_Show_venue_id_start_time and ix_Show_artist_id_start_time: an
+        overlapping show starts between SHOW_MAX_DURATION before the
+        booking and its end, so each lookup is a short index range scan
+        however many shows are booked.
+        """
+        proposed = proposed_bookings
+
+        def overlapping(column, booked):
+            return db.session.query(proposed.c.index, cls).select_from(
+                proposed
+            ).join(cls, db.and_(
+                column == booked,
+                cls.start_time > proposed.c.earliest,
+                cls.start_time < proposed.c.end_time,
+                cls.end_time > proposed.c.start_time,
+                cls.id != proposed.c.show_id
+            # Archived shows still hold their slot until purged.
+            )).execution_options(include_archived=True)
+
+        return overlapping(cls.venue_id, proposed.c.venue_id).union_all(
+            overlapping(cls.artist_id, proposed.c.artist_id)
+        )
+
+    @classmethod
+    def conflicts(cls, bookings):
+        """Overlaps of proposed bookings with the shows already booked and
+        with each other.
+
+        Bookings are shows, saved or not; a saved one doesn't conflict with
+        itself. They are inserted into `proposed_bookings` with one
+        executemany and the shows looked up with one query, whose compiled
+        form is reused whatever the bookings. Returns {booking index:
+        {'shows': [overlapping shows], 'bookings': [indexes of overlapping
+        bookings]}} for the bookings overlapping anything.
+        """
+        bookings = list(bookings)
+        conflicts = {}
+
+        def conflict(i):
+            return conflicts.setdefault(i, {'shows': [], 'bookings': []})
+
+        if bookings:
+            connection = db.session.connection()
+            proposed_bookings.create(connection, checkfirst=True)
+            connection.execute(proposed_bookings.insert(), [
+                {
+                    'index': i,
+                    'show_id': booking.id or 0,
+                    'venue_id': int(booking.venue_id),
+                    'artist_id': int(booking.artist_id),
+                    'earliest': booking.start_time - SHOW_MAX_DURATION,
+                    'start_time': booking.start_time,
+                    'end_time': _end_time(booking),
+                }
+                for i, booking in enumerate(bookings)
+            ])
+            try:
+                for i, show in cls.conflicts_query():
+                    # A show sharing both the venue and the artist comes
+                    # twice.
+                    if show not in conflict(i)['shows']:
+                        conflict(i)['shows'].append(show)
+            finally:
+                connection.execute(proposed_bookings.delete())
+
+        for i, j in _overlaps_within(bookings):
+            conflict(i)['bookings'].append(j)
+            conflict(j)['bookings'].append(i)
+        for found in conflicts.values():
+            found['bookings'] = sorted(set(found['bookings']))
+        return conflicts
+
+    @classmethod
+    def roll_over(cls, now=None):
+        """Move shows that have started from the upcoming to the past
+        counters of their venues and artists.
+
+        Meant to run periodically; counters lag behind by at most the time
+        between runs. Returns the number of shows moved.
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        # Archived shows too, as the UPDATE below can't leave them out;
+        # they aren't counted anyway.
+        started = db.session.query(cls.venue_id, cls.artist_id).filter(
+            cls.is_upcoming, cls.start_time <= now
+        ).execution_options(include_archived=True).all()
+        if not started:
+            return 0
+
+        venue_ids = {venue_id for venue_id, _ in started}
+        artist_ids = {artist_id for _, artist_id in started}
+        with unit_of_work() as work:
+            db.session.query(cls).filter(
+                cls.is_upcoming, cls.start_time <= now
+            ).update({
+                cls.is_upcoming: False,
+                # Not an edit; see refresh_show_counts().
+                cls.updated_at: cls.updated_at,
+            }, synchronize_session=False)
+            work.recount(venue_ids, artist_ids)
+            work.invalidate(
+                'venues', 'artists',
+                *[f'venue:{venue_id}' for venue_id in venue_ids],
+                *[f'artist:{artist_id}' for artist_id in artist_ids]
+            )
+        return len(started)
+
+    @property
+    def cache_tags(self):
+        """Cached pages that render this show or count it."""
+        return [
+            'shows', 'artists', 'venues',
+            f'artist:{self.artist_id}', f'venue:{self.venue_id}'
+        ]
+
+    @property
+    def fragment_version(self):
+        """Stamp of the show's cached tile, which also renders its venue
+        and artist."""
+        return '.'.join([
+            f'{self.updated_at:%Y%m%d%H%M%S%f}',
+            self.venue.fragment_version,
+            self.artist.fragment_version
+        ])
+
     @property
+    @measure('serialize')
     def serialize(self):
         return {
             'id': self.id,
             'start_time': self.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
+            'end_time': self.end_time.strftime("%m/%d/%Y, %H:%M:%S"),
             'artist_id': self.artist_id,
             'venue_id': self.venue_id
         }
 
     @property
+    @measure('serialize')
     def serialize_with_artist_venue(self):
         return {
             'id': self.id,
-            'venue': [v.serialize for v in Venue.query.filter(Venue.id == self.venue_id).all()][0],
-            'artist': [a.serialize for a in Artist.query.filter(Artist.id == self.artist_id).all()][0],
-            'start_time': self.start_time.strftime("%m/%d/%Y, %H:%M:%S")
-        }
\ No newline at end of file
+            'venue': self.venue.serialize,
+            'artist': self.artist.serialize,
+            'start_time': self.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
+            'end_time': self.end_time.strftime("%m/%d/%Y, %H:%M:%S")
+        }
+
+    @classmethod
+    def in_window(cls, start, end, city=None, state=None, genre=None):
+        """Shows starting in [start, end), in start time order, with their
+        venue and artist loaded; `city` and `state` are the venue's, and
+        `genre` one the artist plays.
+
+        Served by a range scan of ix_Show_start_time_id, or of
+        ix_Show_venue_id_start_time for each venue the filters select, so
+        the cost follows the shows in the window rather than all of them.
+        """
+        query = cls.query.join(cls.venue).options(
+            db.contains_eager(cls.venue), db.joinedload(cls.artist)
+        ).filter(cls.start_time >= start, cls.start_time < end)
+        if city:
+            query = query.filter(Venue.city == city)
+        if state:
+            query = query.filter(Venue.state == state)
+        if genre:
+            query = query.filter(cls.artist_id.in_(
+                db.session.query(ArtistGenre.artist_id).filter(
+                    ArtistGenre.genre == genre
+                )
+            ))
+        return query.order_by(cls.start_time, cls.id)
+
+    @classmethod
+    def query_with_artist_venue(cls):
+        """Show query with the venue and artist joined in the same statement.
+
+        Use it before `serialize_with_artist_venue` on many shows so the
+        relationships are already loaded instead of fetched per row.
+        """
+        return cls.query.options(
+            db.joinedload(cls.venue),
+            db.joinedload(cls.artist)
+        )
+
+
+# No double bookings on PostgreSQL either, where btree_gist lets a GiST
+# index exclude overlapping time ranges per venue and per artist.
+event.listen(
+    Show.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    .execute_if(dialect='postgresql')
+)
+for _column in ('venue_id', 'artist_id'):
+    event.listen(
+        Show.__table__, 'after_create',
+        DDL(
+            f'ALTER TABLE "Show" ADD CONSTRAINT "Show_{_column}_overlap_excl" '
+            f'EXCLUDE USING gist ({_column} WITH =, '
+            f'tsrange(start_time, end_time) WITH &&)'
+        ).execute_if(dialect='postgresql')
+    )
+# The name indexes of Venue and Artist use pg_trgm's gin_trgm_ops.
+for _table in (Venue.__table__, Artist.__table__):
+    event.listen(
+        _table, 'before_create',
+        DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        .execute_if(dialect='postgresql')
+    )
+
+
+# Bookings checked by Show.conflicts(), in a temporary table of the
+# connection: created on first use, never by create_all() or migrations.
+proposed_bookings = Table(
+    'proposed_bookings', MetaData(),
+    db.Column('index', db.Integer, primary_key=True),
+    db.Column('show_id', db.Integer, nullable=False),
+    db.Column('venue_id', db.Integer, nullable=False),
+    db.Column('artist_id', db.Integer, nullable=False),
+    db.Column('earliest', db.DateTime, nullable=False),
+    db.Column('start_time', db.DateTime, nullable=False),
+    db.Column('end_time', db.DateTime, nullable=False),
+    prefixes=['TEMPORARY'],
+    postgresql_on_commit='DELETE ROWS'
+)
+
+
+class VenueGenre(db.Model):
+    __tablename__ = 'VenueGenre'
+
+    # (genre, venue_id) is the primary key so browsing a genre is an index
+    # range scan; venue_id has its own index for loading a venue's genres.
+    genre = db.Column(db.String(120), primary_key=True)
+    venue_id = db.Column(
+        db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'),
+        primary_key=True, index=True
+    )
+
+    def __repr__(self):
+        return f'<VenueGenre {self.venue_id} {self.genre}>'
+
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'ArtistGenre'
+
+    genre = db.Column(db.String(120), primary_key=True)
+    artist_id = db.Column(
+        db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'),
+        primary_key=True, index=True
+    )
+
+    def __repr__(self):
+        return f'<ArtistGenre {self.artist_id} {self.genre}>'
@@ -0,0 +1,114 @@
+import base64
+import datetime
+import json
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    payload = [
+        v.isoformat() if isinstance(v, datetime.datetime) else v
+        for v in values
+    ]
+    return base64.urlsafe_b64encode(
+        json.dumps(payload).encode()
+    ).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise InvalidCursor(cursor)
+
+        values = []
+        for column, value in zip(columns, payload):
+            if value is not None and \
+                    column.type.python_type is datetime.datetime:
+                value = datetime.datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def keyset_query(query, columns, after=None, before=None, per_page=50):
+    """`query` narrowed to one page (plus one row) ordered by `columns`.
+
+    Works on ORM queries and select() statements alike.
+    """
+    backwards = before is not None
+    cursor = before if backwards else after
+
+    if cursor is not None:
+        values = decode_cursor(cursor, columns)
+        if backwards:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    if backwards:
+        query = query.order_by(*[c.desc() for c in columns])
+    else:
+        query = query.order_by(*columns)
+    return query.limit(per_page + 1)
+
+
+def keyset_page(rows, key, after=None, before=None, per_page=50):
+    """The KeysetPage of `rows` fetched with `keyset_query`."""
+    backwards = before is not None
+    cursor = before if backwards else after
+
+    rows = list(rows)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+
+    first = encode_cursor(key(rows[0]))
+    last = encode_cursor(key(rows[-1]))
+    if backwards:
+        return KeysetPage(
+            rows, next_cursor=last, prev_cursor=first if has_more else None
+        )
+    return KeysetPage(
+        rows,
+        next_cursor=last if has_more else None,
+        prev_cursor=first if cursor is not None else None
+    )
+
+
+def keyset_paginate(query, columns, key, after=None, before=None,
+                    per_page=50):
+    """Fetch one page of `query` ordered by `columns` without OFFSET.
+
+    `key` maps a result row to its values for `columns`; those values are
+    what the next/prev cursors encode. Each page is a single
+    `WHERE (columns) > (cursor) ORDER BY columns LIMIT per_page + 1` lookup,
+    so its cost depends on the page size only.
+    """
+    rows = keyset_query(query, columns, after, before, per_page).all()
+    return keyset_page(rows, key, after, before, per_page)
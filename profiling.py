@@ -0,0 +1,181 @@
+import contextlib
+import heapq
+import threading
+import time
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _current_profile():
+    if not has_app_context():
+        return None
+    return g.get('_profile')
+
+
+class measure(contextlib.ContextDecorator):
+    """Add the time spent in a block to the current request's `kind` total.
+
+    Nested measurements of the same kind only count the outermost one, so
+    serializers calling other serializers aren't counted twice. It does
+    nothing when profiling is disabled.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __enter__(self):
+        profile = _current_profile()
+        if profile is not None:
+            depth = profile['depth'].get(self.kind, 0)
+            profile['depth'][self.kind] = depth + 1
+            if depth == 0:
+                profile['started'][self.kind] = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        profile = _current_profile()
+        if profile is not None and self.kind in profile['depth']:
+            profile['depth'][self.kind] -= 1
+            if profile['depth'][self.kind] == 0:
+                elapsed = time.perf_counter() - profile['started'][self.kind]
+                profile['timings'][self.kind] = \
+                    profile['timings'].get(self.kind, 0.0) + elapsed
+        return False
+
+
+class Profiler:
+    """Opt-in per-request query, template and serialization profiling.
+
+    Each request gets a `Server-Timing` header; totals per route are
+    published through `prometheus()`. Requests running more queries than
+    PROFILING_QUERY_BUDGET are logged with their slowest statements.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._routes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILING_ENABLED', False)
+        if not self.enabled:
+            return
+
+        self.logger = app.logger
+        self.query_budget = app.config.get('PROFILING_QUERY_BUDGET', 20)
+        self.slow_statements = app.config.get('PROFILING_SLOW_STATEMENTS', 5)
+
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+        base = app.jinja_env.template_class
+
+        class TimedTemplate(base):
+            def render(self, *args, **kwargs):
+                with measure('render'):
+                    return super().render(*args, **kwargs)
+
+        app.jinja_env.template_class = TimedTemplate
+
+    def _start(self):
+        g._profile = {
+            'started_at': time.perf_counter(),
+            'queries': 0,
+            'statements': [],
+            'depth': {},
+            'started': {},
+            'timings': {},
+        }
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        conn.info.setdefault('profile_started', []).append(
+            time.perf_counter()
+        )
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        started = conn.info['profile_started'].pop()
+        profile = _current_profile()
+        if profile is None:
+            return
+
+        elapsed = time.perf_counter() - started
+        profile['queries'] += 1
+        profile['timings']['db'] = profile['timings'].get('db', 0.0) + elapsed
+        heapq.heappush(profile['statements'], (elapsed, statement))
+        if len(profile['statements']) > self.slow_statements:
+            heapq.heappop(profile['statements'])
+
+    def _finish(self, response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+
+        total = time.perf_counter() - profile['started_at']
+        timings = profile['timings']
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timings.get("db", 0.0) * 1000:.2f};'
+            f'desc="{profile["queries"]} queries"',
+            f'render;dur={timings.get("render", 0.0) * 1000:.2f}',
+            f'serialize;dur={timings.get("serialize", 0.0) * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'requests': 0, 'queries': 0, 'total': 0.0,
+                'db': 0.0, 'render': 0.0, 'serialize': 0.0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += profile['queries']
+            stats['total'] += total
+            for kind in ('db', 'render', 'serialize'):
+                stats[kind] += timings.get(kind, 0.0)
+
+        if profile['queries'] > self.query_budget:
+            slowest = sorted(profile['statements'], reverse=True)
+            self.logger.warning(
+                '%s %s ran %d queries (budget %d) in %.1fms; slowest:\n%s',
+                request.method, request.path, profile['queries'],
+                self.query_budget, timings.get('db', 0.0) * 1000,
+                '\n'.join(f'  {d * 1000:.1f}ms {s}' for d, s in slowest)
+            )
+        return response
+
+    def prometheus(self):
+        """Per-route totals in the Prometheus text exposition format."""
+        if not self.enabled:
+            return ''
+
+        with self._lock:
+            routes = {r: dict(s) for r, s in self._routes.items()}
+
+        lines = []
+        for key, metric, help_text in [
+            ('requests', 'fyyur_requests_total', 'Requests served.'),
+            ('queries', 'fyyur_request_queries_total', 'SQL queries run.'),
+            ('total', 'fyyur_request_seconds_total', 'Time spent serving.'),
+            ('db', 'fyyur_request_db_seconds_total',
+             'Time spent executing SQL.'),
+            ('render', 'fyyur_request_render_seconds_total',
+             'Time spent rendering templates.'),
+            ('serialize', 'fyyur_request_serialize_seconds_total',
+             'Time spent serializing models.'),
+        ]:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} counter')
+            for route, stats in routes.items():
+                lines.append(f'{metric}{{route="{route}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+profiler = Profiler()
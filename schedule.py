@@ -0,0 +1,81 @@
+import datetime
+from itertools import groupby
+
+from enums import State, Genre
+
+
+# Query arguments that turn a show listing into a calendar query.
+CALENDAR_ARGS = ('from', 'to', 'city', 'state', 'genre')
+DEFAULT_SPAN = datetime.timedelta(days=7)
+
+
+class InvalidWindow(ValueError):
+    pass
+
+
+def is_calendar_query(args):
+    return any(args.get(arg) for arg in CALENDAR_ARGS)
+
+
+def local_time(value):
+    """`value` as the naive local time show times are stored as."""
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _parse_time(args, name, whole_day=False):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError as e:
+        raise InvalidWindow(f'{name}: {value}') from e
+
+    parsed = local_time(parsed)
+    if whole_day and len(value) == len('YYYY-MM-DD'):
+        parsed += datetime.timedelta(days=1)
+    return parsed
+
+
+def _choice(args, name, enum):
+    value = args.get(name) or None
+    if value is not None and value not in {choice.value for choice in enum}:
+        raise InvalidWindow(f'{name}: {value}')
+    return value
+
+
+def parse_window(args, max_days, now=None):
+    """Keyword arguments of `Show.in_window` for a calendar query.
+
+    `from` and `to` are ISO dates or datetimes, a date `to` taking in that
+    whole day. `from` defaults to now and `to` to a week after `from`.
+    Windows longer than `max_days` are refused, which bounds every answer.
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    start = _parse_time(args, 'from') or now
+    end = _parse_time(args, 'to', whole_day=True) or start + DEFAULT_SPAN
+    if end <= start:
+        raise InvalidWindow('to must come after from')
+    if end - start > datetime.timedelta(days=max_days):
+        raise InvalidWindow(f'windows are at most {max_days} days')
+
+    return {
+        'start': start,
+        'end': end,
+        'city': (args.get('city') or '').strip() or None,
+        'state': _choice(args, 'state', State),
+        'genre': _choice(args, 'genre', Genre),
+    }
+
+
+def group_by_day(shows):
+    """[(date, shows)] of shows ordered by start time, in one pass."""
+    return [
+        (day, list(day_shows))
+        for day, day_shows in groupby(
+            shows, key=lambda show: show.start_time.date()
+        )
+    ]
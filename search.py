@@ -0,0 +1,94 @@
+from sqlalchemy import DDL, column, event, func, table
+
+from model import db, Venue, Artist
+
+
+# Trigram substrings shorter than this can't use the SQLite FTS index.
+MIN_FTS_TERM_LENGTH = 3
+
+
+def register_fts(model):
+    """Maintain a SQLite FTS5 trigram index over `model.name`.
+
+    This is the local/test counterpart of the pg_trgm GIN index created by
+    the migrations: the virtual table and its sync triggers are created and
+    dropped along with the model's table, on SQLite only.
+    """
+    name = model.__tablename__
+    fts = f'{name}_fts'
+    statements = [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+        f'name, content=\'{name}\', content_rowid=\'id\', '
+        f'tokenize=\'trigram\')',
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) '
+        f'VALUES (\'delete\', old.id, old.name); END',
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF name ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) '
+        f'VALUES (\'delete\', old.id, old.name); '
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+    ]
+    for statement in statements:
+        event.listen(
+            model.__table__, 'after_create',
+            DDL(statement).execute_if(dialect='sqlite')
+        )
+    event.listen(
+        model.__table__, 'before_drop',
+        DDL(f'DROP TABLE IF EXISTS "{fts}"').execute_if(dialect='sqlite')
+    )
+
+
+register_fts(Venue)
+register_fts(Artist)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(model, term, city=None, state=None, genre=None, limit=50):
+    return search_query(model, term, city, state, genre).limit(limit).all()
+
+
+def search_query(model, term, city=None, state=None, genre=None):
+    """Case-insensitive partial name search, ranked.
+
+    On PostgreSQL the ILIKE is answered by the pg_trgm GIN index and results
+    are ranked by trigram similarity; on SQLite the FTS5 trigram table is
+    used and ranked by bm25. An empty term lists every match of the filters.
+    """
+    query = model.query
+    if city:
+        query = query.filter(model.city.ilike(_escape_like(city), escape='\\'))
+    if state:
+        query = query.filter(model.state == state)
+    if genre:
+        query = query.filter(model.genre_links.any(genre=genre))
+
+    term = (term or '').strip()
+    dialect = db.engine.dialect.name
+
+    if not term:
+        query = query.order_by(model.name, model.id)
+    elif dialect == 'sqlite' and len(term) >= MIN_FTS_TERM_LENGTH:
+        fts_name = f'{model.__tablename__}_fts'
+        fts = table(fts_name, column('rowid'), column('rank'), column(fts_name))
+        phrase = '"' + term.replace('"', '""') + '"'
+        query = query.join(fts, fts.c.rowid == model.id).filter(
+            fts.c[fts_name].op('MATCH')(phrase)
+        ).order_by(fts.c.rank, model.id)
+    else:
+        query = query.filter(
+            model.name.ilike(f'%{_escape_like(term)}%', escape='\\')
+        )
+        if dialect == 'postgresql':
+            query = query.order_by(
+                func.similarity(model.name, term).desc(), model.id
+            )
+        else:
+            query = query.order_by(model.name, model.id)
+
+    return query
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def configure_templates(app):
+    """Production rendering, enabled by TEMPLATE_CACHE_DIR.
+
+    Compiled templates are kept in that directory, shared by every worker
+    (`flask compile-templates` fills it at build time), templates are no
+    longer checked for changes on each render, and all of them are
+    compiled at startup so no request pays for it.
+    """
+    cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+    if not cache_dir:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.jinja_env.auto_reload = False
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    compile_templates(app.jinja_env)
+
+
+def compile_templates(env):
+    """Load every HTML template of `env`, writing its bytecode cache.
+
+    Returns the number of templates compiled.
+    """
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def _fresh_environment(app, bytecode_cache=None):
+    """The app's environment with nothing compiled yet."""
+    return app.jinja_env.overlay(
+        bytecode_cache=bytecode_cache, cache_size=app.jinja_env.cache.capacity
+    )
+
+
+def benchmark_templates(app, template='pages/home.html', renders=1000):
+    """Cold start and per-render times of the templates, with and without
+    a bytecode cache and auto-reload.
+
+    Returns {measurement: seconds}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        started = time.perf_counter()
+        compile_templates(_fresh_environment(app))
+        results['cold start, from source'] = time.perf_counter() - started
+
+        compile_templates(
+            _fresh_environment(app, FileSystemBytecodeCache(cache_dir))
+        )
+        started = time.perf_counter()
+        compile_templates(
+            _fresh_environment(app, FileSystemBytecodeCache(cache_dir))
+        )
+        results['cold start, from bytecode cache'] = \
+            time.perf_counter() - started
+
+    auto_reload = app.jinja_env.auto_reload
+    try:
+        with app.test_request_context():
+            context = {}
+            app.update_template_context(context)
+            for reload in (True, False):
+                app.jinja_env.auto_reload = reload
+                app.jinja_env.get_template(template).render(context)
+                started = time.perf_counter()
+                for _ in range(renders):
+                    app.jinja_env.get_template(template).render(context)
+                label = 'on' if reload else 'off'
+                results[f'render, auto-reload {label}'] = \
+                    (time.perf_counter() - started) / renders
+    finally:
+        app.jinja_env.auto_reload = auto_reload
+    return results
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from app import app as fyyur_app  # noqa: E402
+from cache import response_cache, fragment_cache  # noqa: E402
+from model import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    fyyur_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    response_cache.enabled = False
+    fragment_cache.enabled = False
+    with fyyur_app.app_context():
+        db.create_all()
+        yield fyyur_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
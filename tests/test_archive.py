@@ -0,0 +1,40 @@
+import datetime
+
+from model import db, Venue, Artist, Show
+
+
+def test_archiving_a_venue_recounts_its_artists(app):
+    venues = [Venue(name=f'Venue {i}', city='City', state='CA')
+              for i in range(2)]
+    artist = Artist(name='Artist', city='City', state='CA')
+    db.session.add_all([*venues, artist])
+    db.session.commit()
+    now = datetime.datetime.now()
+    for venue, days in [(venues[0], -2), (venues[0], 2), (venues[1], 3)]:
+        Show(
+            venue_id=venue.id, artist_id=artist.id,
+            start_time=now + datetime.timedelta(days=days)
+        ).save()
+
+    venues[0].archive()
+    db.session.expire_all()
+
+    assert (artist.past_shows_count, artist.upcoming_shows_count) == (0, 1)
+    assert len(Artist.load_details(artist.id)['upcoming_shows']) == 1
+
+
+def test_roll_over_moves_shows_of_archived_venues_too(app):
+    venue = Venue(name='Venue', city='City', state='CA')
+    artist = Artist(name='Artist', city='City', state='CA')
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    start_time = datetime.datetime.now() + datetime.timedelta(days=1)
+    Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time).save()
+    venue.archive()
+
+    moved = Show.roll_over(now=start_time + datetime.timedelta(hours=1))
+
+    assert moved == 1
+    assert db.session.query(Show.is_upcoming).execution_options(
+        include_archived=True
+    ).scalar() is False
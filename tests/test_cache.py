@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+from cache import response_cache
+from importer import import_rows
+from model import db, Venue, Artist, Show
+
+
+@pytest.fixture
+def cached(app):
+    response_cache.backend.clear()
+    response_cache.enabled = True
+    yield response_cache
+    response_cache.enabled = False
+    response_cache.backend.clear()
+
+
+def test_moving_a_show_rerenders_the_old_venue(client, cached):
+    venues = [Venue(name=f'Venue {i}', city='City', state='CA')
+              for i in range(2)]
+    artist = Artist(name='Touring Artist', city='City', state='CA')
+    db.session.add_all([*venues, artist])
+    db.session.commit()
+    show = Show(
+        venue_id=venues[0].id, artist_id=artist.id,
+        start_time=datetime.datetime.now() + datetime.timedelta(days=3)
+    )
+    show.save()
+
+    page = f'/venues/{venues[0].id}'
+    assert 'Touring Artist' in client.get(page).get_data(as_text=True)
+    hits = cached.hits
+    assert 'Touring Artist' in client.get(page).get_data(as_text=True)
+    assert cached.hits == hits + 1
+
+    show.update(venue_id=venues[1].id)
+
+    assert 'Touring Artist' not in client.get(page).get_data(as_text=True)
+    assert 'Touring Artist' in client.get(
+        f'/venues/{venues[1].id}'
+    ).get_data(as_text=True)
+
+
+def test_imports_invalidate_the_listings(client, cached):
+    assert 'Imported Venue' not in client.get('/venues').get_data(as_text=True)
+
+    assert import_rows('venues', [(2, {
+        'name': 'Imported Venue', 'city': 'City', 'state': 'CA',
+        'address': '1 Main St',
+    })]) == (1, [])
+
+    assert 'Imported Venue' in client.get('/venues').get_data(as_text=True)
+
+
+def test_calendars_starting_now_are_not_cached(client, cached):
+    for url, cacheable in [
+        ('/shows?state=CA', False),
+        ('/shows?from=2030-01-01&state=CA', True),
+        ('/shows', True),
+    ]:
+        hits = cached.hits
+        for _ in range(2):
+            assert client.get(url).status_code == 200
+        assert cached.hits == hits + cacheable
@@ -0,0 +1,53 @@
+import datetime
+
+from sqlalchemy import event
+
+from model import db, Venue, Artist, Show
+
+
+def add_venues(count, start=0):
+    """`count` venues, each in its own city with a past and an upcoming show."""
+    artist = Artist.query.first()
+    if artist is None:
+        artist = Artist(name='Artist', city='San Francisco', state='CA')
+        db.session.add(artist)
+        db.session.flush()
+    now = datetime.datetime.now()
+    for i in range(start, start + count):
+        venue = Venue(
+            name=f'Venue {i}', city=f'City {i}', state='CA',
+            address=f'{i} Main St', genres=['Jazz']
+        )
+        db.session.add(venue)
+        db.session.flush()
+        for days in (-1 - i, 1 + i):
+            db.session.add(Show(
+                venue_id=venue.id, artist_id=artist.id,
+                start_time=now + datetime.timedelta(days=days),
+                is_upcoming=days > 0
+            ))
+    db.session.commit()
+
+
+def statements_run(client, path):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_venue_listing_statements_dont_grow_with_venues(app, client):
+    add_venues(4)
+    few = statements_run(client, '/venues')
+    add_venues(36, start=4)
+    many = statements_run(client, '/venues')
+
+    assert few == many == 2
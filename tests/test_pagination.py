@@ -0,0 +1,51 @@
+import datetime
+
+import pytest
+
+from model import db, Venue
+from pagination import (
+    InvalidCursor, decode_cursor, encode_cursor, keyset_paginate
+)
+
+
+COLUMNS = [Venue.name, Venue.id]
+
+
+def key(venue):
+    return venue.name, venue.id
+
+
+def test_cursor_round_trip():
+    columns = [Venue.updated_at, Venue.id]
+    values = [datetime.datetime(2024, 5, 1, 20, 30), 7]
+    assert decode_cursor(encode_cursor(values), columns) == values
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', encode_cursor([1])])
+def test_invalid_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, COLUMNS)
+
+
+def test_pages_forward_and_back(app):
+    for i in range(7):
+        db.session.add(Venue(name=f'Venue {i}', city='City', state='CA'))
+    db.session.commit()
+
+    pages = [keyset_paginate(Venue.query, COLUMNS, key, per_page=3)]
+    while pages[-1].has_next:
+        pages.append(keyset_paginate(
+            Venue.query, COLUMNS, key, after=pages[-1].next_cursor, per_page=3
+        ))
+    assert [[v.name for v in page.items] for page in pages] == [
+        ['Venue 0', 'Venue 1', 'Venue 2'],
+        ['Venue 3', 'Venue 4', 'Venue 5'],
+        ['Venue 6'],
+    ]
+    assert not pages[0].has_prev
+
+    back = keyset_paginate(
+        Venue.query, COLUMNS, key, before=pages[2].prev_cursor, per_page=3
+    )
+    assert back.items == pages[1].items
+    assert back.has_prev and back.has_next
@@ -0,0 +1,8 @@
+from benchmark import seed_data
+from explain import check_plans
+
+
+def test_hot_queries_use_indexes(app):
+    seed_data(venues=50, artists=100, shows=500)
+
+    assert check_plans() == {}
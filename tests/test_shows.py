@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+from model import db, Venue, Artist, Show, _overlaps_within
+
+
+START = datetime.datetime(2030, 6, 1, 20)
+
+
+def booking(venue_id, artist_id, hours, duration=2):
+    start_time = START + datetime.timedelta(hours=hours)
+    return Show(
+        venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+        end_time=start_time + datetime.timedelta(hours=duration)
+    )
+
+
+def test_overlaps_within_bookings():
+    bookings = [
+        booking(1, 1, 0),
+        booking(1, 2, 1),   # same venue as 0, overlapping
+        booking(2, 1, 2),   # same artist as 0, starting as it ends
+        booking(3, 2, 2),   # same artist as 1, overlapping
+        booking(1, 3, 24),
+    ]
+    assert sorted(_overlaps_within(bookings)) == [(0, 1), (1, 3)]
+
+
+def test_validate_times():
+    booking(1, 1, 0).validate_times()
+    for duration in (0, -1, 25):
+        with pytest.raises(ValueError):
+            booking(1, 1, 0, duration=duration).validate_times()
+
+
+def test_conflicts_with_booked_shows(app):
+    venue = Venue(name='Venue', city='City', state='CA')
+    artists = [Artist(name=f'Artist {i}', city='City', state='CA')
+               for i in range(2)]
+    db.session.add_all([venue, *artists])
+    db.session.commit()
+    booked = booking(venue.id, artists[0].id, 0)
+    booked.save()
+
+    conflicts = Show.conflicts([
+        booking(venue.id, artists[1].id, 1),
+        booking(venue.id, artists[1].id, 2),
+        booking(venue.id, artists[1].id, 3),
+        booked,
+    ])
+
+    assert conflicts == {
+        0: {'shows': [booked], 'bookings': [1, 3]},
+        1: {'shows': [], 'bookings': [0, 2]},
+        2: {'shows': [], 'bookings': [1]},
+        3: {'shows': [], 'bookings': [0]},
+    }
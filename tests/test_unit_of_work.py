@@ -0,0 +1,39 @@
+import pytest
+
+from model import db, Venue, unit_of_work
+
+
+def venue(name):
+    return Venue(name=name, city='City', state='CA')
+
+
+def test_nested_units_commit_once(app, monkeypatch):
+    commits = []
+    monkeypatch.setattr(
+        db.session, 'commit',
+        lambda commit=db.session.commit: commits.append(commit()) or None
+    )
+
+    with unit_of_work() as outer:
+        venue('First').save()
+        with unit_of_work() as inner:
+            assert inner is outer
+            venue('Second').save()
+        assert commits == []
+
+    assert len(commits) == 1
+    assert 'unit_of_work' not in db.session.info
+    assert sorted(v.name for v in Venue.query) == ['First', 'Second']
+
+
+def test_unit_rolls_back_on_error(app):
+    venue('Kept').save()
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            venue('Dropped').save()
+            Venue.query.filter_by(name='Kept').one().update(name='Renamed')
+            raise RuntimeError
+
+    assert 'unit_of_work' not in db.session.info
+    assert [v.name for v in Venue.query] == ['Kept']